@@ -1,6 +1,6 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
-#  License: GNU LGPLv3
-#  
-#  This file is part of Multi-Mechanize
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
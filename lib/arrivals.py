@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""arrival rate schedules for open-model (rate driven) user groups"""
+
+import math
+import re
+
+
+
+class ArrivalSchedule(object):
+    """
+    Target transactions/sec over the course of a run.
+
+    points is a list of (elapsed secs, transactions/sec).  With the 'step'
+    profile each rate holds until the next point; with the 'ramp' profile
+    the rate changes linearly between points.  The first rate applies from
+    the start of the run, the last one until its end.
+    """
+    def __init__(self, points, profile='step'):
+        if profile not in ('step', 'ramp'):
+            raise ValueError('unknown arrival profile: %s (use step or ramp)' % profile)
+        if not points:
+            raise ValueError('no arrival rate given')
+        self.points = sorted((float(t), float(r)) for t, r in points)
+        if self.points[0][0] > 0:
+            self.points.insert(0, (0.0, self.points[0][1]))
+        self.profile = profile
+
+    @classmethod
+    def parse(cls, spec, profile='step'):
+        """
+        Parse an arrival_rate option: either a single rate ("50") or
+        elapsed:rate points ("0:10, 60:50, 120:100").
+        """
+        points = []
+        for item in re.split(r'[\s,]+', spec.strip()):
+            if ':' in item:
+                t, r = item.split(':', 1)
+            else:
+                t, r = 0, item
+            points.append((float(t), float(r)))
+        return cls(points, profile)
+
+    def segments(self, run_time):
+        """(start, end, rate at start, slope) for each piece of the schedule"""
+        segments = []
+        for (start, rate), (end, next_rate) in zip(self.points, self.points[1:] + [(run_time, None)]):
+            if self.profile == 'ramp' and next_rate is not None and end > start:
+                slope = (next_rate - rate) / (end - start)
+            else:
+                slope = 0.0
+            end = min(end, run_time)
+            if end > start:
+                segments.append((start, end, rate, slope))
+        return segments
+
+    def launch_times(self, run_time, scale=1.0, phase=0.0):
+        """
+        Generates the elapsed times at which transactions should be launched.
+
+        Launch n happens when the expected number of arrivals (the integral
+        of the rate times scale) reaches n + phase.  Splitting one schedule
+        over K processes with scale=1/K and phase=k/K interleaves them exactly.
+        """
+        arrivals = 0.0  # expected arrivals before the current segment
+        target = phase
+        for start, end, rate, slope in self.segments(run_time):
+            rate *= scale
+            slope *= scale
+            length = end - start
+            segment_arrivals = rate * length + 0.5 * slope * length ** 2
+            while target < arrivals + segment_arrivals:
+                needed = target - arrivals
+                if slope == 0:
+                    offset = needed / rate
+                else:
+                    offset = (-rate + math.sqrt(max(rate * rate + 2 * slope * needed, 0))) / slope
+                yield start + offset
+                target += 1
+            arrivals += segment_arrivals
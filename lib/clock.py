@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""
+monotonic, high-resolution time for timing transactions
+
+time.time() follows the system clock, which ntp can slew or step in the
+middle of a run.  monotonic() never goes backwards, so it is what
+response times and elapsed times are measured with.  A process takes one
+wall-clock anchor (see WallClock) and derives epoch timestamps from
+monotonic readings, to the sub-millisecond, instead of asking the system
+clock again for every transaction.
+
+python 2 has no time.monotonic(), so on linux clock_gettime(CLOCK_MONOTONIC)
+is called through ctypes.  on windows time.clock() (the performance counter)
+is monotonic; elsewhere it falls back to time.time().  thread_cpu_time() 
+is only there on linux.
+"""
+
+import ctypes
+import ctypes.util
+import sys
+import time
+
+
+
+# from linux's <time.h>
+CLOCK_MONOTONIC = 1
+CLOCK_THREAD_CPUTIME_ID = 3
+
+
+
+def _linux_clock(clock_id):
+    """a function reading clock_gettime(clock_id) in secs, or None if it's not available"""
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    for lib_name in ('c', 'rt'):  # glibc before 2.17 has it in librt
+        path = ctypes.util.find_library(lib_name)
+        if path is None:
+            continue
+        try:
+            clock_gettime = ctypes.CDLL(path).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        clock_gettime.restype = ctypes.c_int
+        if clock_gettime(clock_id, ctypes.byref(timespec())) != 0:
+            continue
+
+        # a timespec per call, since other threads run while clock_gettime does
+        def read_clock(timespec=timespec, clock_gettime=clock_gettime, byref=ctypes.byref):
+            ts = timespec()
+            clock_gettime(clock_id, byref(ts))
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+        return read_clock
+    return None
+
+
+
+if hasattr(time, 'monotonic'):
+    monotonic = time.monotonic
+    MONOTONIC_SOURCE = 'time.monotonic'
+elif sys.platform.startswith('win'):
+    monotonic = time.clock
+    MONOTONIC_SOURCE = 'time.clock'
+else:
+    monotonic = sys.platform.startswith('linux') and _linux_clock(CLOCK_MONOTONIC)
+    MONOTONIC_SOURCE = 'clock_gettime'
+    if not monotonic:
+        monotonic = time.time
+        MONOTONIC_SOURCE = 'time.time'
+
+# the cpu secs used by the calling thread, where it can be measured (else None)
+thread_cpu_time = sys.platform.startswith('linux') and _linux_clock(CLOCK_THREAD_CPUTIME_ID) or None
+
+
+
+class WallClock(object):
+    """
+    Converts between monotonic() readings and epoch secs, from one anchor
+    reading of both clocks.
+    """
+    def __init__(self):
+        self.anchor()
+
+    def anchor(self):
+        """read both clocks, as close together as possible"""
+        before = monotonic()
+        wall = time.time()
+        after = monotonic()
+        self.wall = wall
+        self.mono = (before + after) / 2
+
+    def epoch(self, mono):
+        """the epoch secs of a monotonic() reading"""
+        return self.wall + (mono - self.mono)
+
+    def mono_at(self, epoch):
+        """the monotonic() reading at epoch secs"""
+        return self.mono + (epoch - self.wall)
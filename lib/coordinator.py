@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""
+headless coordinator for running a project on several nodes at once
+
+The nodes are multi-mechanize instances listening for xml-rpc commands
+(python multi-mechanize.py <project name> --port <port>).  The
+coordinator starts the test on all of them at the same moment, follows
+their progress, pulls their results, and writes one combined report with
+a breakdown per node.
+
+With --collector, the nodes push summaries of their results to the
+coordinator while they run (see lib/resultsstream.py): the progress
+shows the merged live stats, and the report is made from the summaries,
+so no raw results are moved.
+
+usage:
+    python lib/coordinator.py <project name> <host:port> [<host:port> ...] [options]
+
+run it from the multi-mechanize directory, which holds the report templates.
+"""
+
+import csv
+import heapq
+import optparse
+import os
+import socket
+import sys
+import time
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+import results
+from gridclient import GridClient, failures
+from resultsstream import ResultsCollector
+from rpcserver import download_results, download_results_summary
+
+
+
+class Coordinator(object):
+    """
+    Runs a project on nodes, a list of (host, port), starting them all
+    start_delay secs after start() is called.  With a collector address 
+    (host:port, as the nodes reach this machine), a ResultsCollector 
+    listens on its port for the nodes' summaries.  Commands go to all 
+    nodes at once, and fail on a node that doesn't reply within timeout secs.
+    """
+    def __init__(self, project_name, nodes, start_delay=5.0, poll_secs=1.0, collector=None, timeout=10.0):
+        self.project_name = project_name
+        self.nodes = nodes
+        self.client = GridClient(nodes, timeout)
+        self.start_delay = start_delay
+        self.poll_secs = poll_secs
+        self.collector_address = collector
+        self.collector = None
+        self.start_epoch = None
+
+    def node_name(self, node):
+        return '%s_%s' % node
+
+    def values(self, replies):
+        """the values of replies from all nodes, or ValueError if any failed"""
+        if failures(replies):
+            raise ValueError('nodes failed:\n' + failures(replies))
+        return [reply.value for reply in replies]
+
+    def update_configs(self, config):
+        self.values(self.client.call('update_config', config))
+
+    def start(self):
+        """schedule the test on every node, returns the start time (secs since the epoch)"""
+        for node, project_name in zip(self.nodes, self.values(self.client.call('get_project_name'))):
+            if project_name != self.project_name:
+                raise ValueError('node %s:%s is running project %s, not %s' % (node + (project_name, self.project_name)))
+        if self.collector_address is not None:
+            self.collector = ResultsCollector(int(self.collector_address.rsplit(':', 1)[1]))
+            self.collector.start()
+        self.start_epoch = time.time() + self.start_delay
+        replies = self.client.call_each('run_test_at', lambda node: (self.start_epoch, self.collector_address or '', node.name))
+        for node, status in zip(self.nodes, self.values(replies)):
+            if status != 'Test Scheduled':
+                raise ValueError('node %s:%s: %s' % (node + (status,)))
+        if max(reply.latency for reply in replies) > self.start_delay:
+            sys.stderr.write('WARNING: scheduling took longer than the start delay, some nodes started late\n')
+        return self.start_epoch
+
+    def wait(self):
+        """poll the nodes until they all have results, printing their progress"""
+        while True:
+            statuses = self.values(self.client.call('get_status'))
+            elapsed = time.time() - self.start_epoch
+            if self.collector is not None:
+                live = self.collector.snapshot()
+                progress = 'transactions: %i  errors: %i' % (live['transactions'], live['errors'])
+                if 'Transactions' in live['timers']:
+                    progress += '  tps: %.1f  p95: %.3fs' % (live['timers']['Transactions']['throughput'],
+                                                            live['timers']['Transactions']['p95'])
+                print '%6.1fs  %s  nodes pushing: %i/%i' % (elapsed, progress, len(live['nodes']), len(self.nodes))
+            else:
+                progress = '  '.join('%s: %i/%i' % (self.node_name(node), status['transactions'], status['errors'])
+                                     for node, status in zip(self.nodes, statuses))
+                print '%6.1fs  transactions/errors  %s' % (elapsed, progress)
+            if all(not status['test_running'] and status['results_available'] for status in statuses):
+                return
+            time.sleep(self.poll_secs)
+
+    def collect(self, output_dir):
+        """pull the results.csv and config.cfg of every node (all at once) into output_dir/nodes/<node>/"""
+        node_dirs = dict(('%s:%s' % node, os.path.join(output_dir, 'nodes', self.node_name(node), ''))
+                         for node in self.nodes)
+        for node_dir in node_dirs.itervalues():
+            os.makedirs(node_dir)
+
+        def collect_node(node):
+            with open(node_dirs[node.name] + 'config.cfg', 'w') as f:
+                f.write(node.call('get_config'))
+            return download_results(node.proxy, node_dirs[node.name] + 'results.csv')
+
+        self.values(self.client.run(collect_node))
+        return [node_dirs['%s:%s' % node] for node in self.nodes]
+
+    def merge(self, node_dirs, output_dir):
+        """
+        Write the results of all nodes to output_dir/results.csv, merged in
+        elapsed time order and numbered again.
+        """
+        def rows(node_dir):
+            with open(node_dir + 'results.csv', 'rb') as f:
+                for fields in csv.reader(f):
+                    yield float(fields[1]), fields
+
+        with open(os.path.join(output_dir, 'results.csv'), 'wb') as f:
+            writer = csv.writer(f)
+            for trans_count, (elapsed, fields) in enumerate(heapq.merge(*[rows(d) for d in node_dirs])):
+                fields[0] = trans_count + 1
+                writer.writerow(fields)
+
+    def report(self, node_dirs, output_dir):
+        """the combined report, with a summary of each node"""
+        run_time, rampup, ts_interval, report_mode, user_group_configs = \
+            results.read_saved_config(node_dirs[0] + 'config.cfg')
+        node_summaries = []
+        for node, node_dir in zip(self.nodes, node_dirs):
+            node_results = results.Results(node_dir + 'results.csv', run_time, ts_interval)
+            node_summaries.append(results.node_summary('%s:%s' % node, node_results, run_time))
+        # the workload is the total over all the nodes
+        for ug_config in user_group_configs:
+            ug_config.num_threads *= len(self.nodes)
+        with open(node_dirs[0] + 'config.cfg') as f:
+            config = f.read()
+        with open(os.path.join(output_dir, 'config.cfg'), 'w') as f:
+            f.write(config)
+        results.output_results(output_dir, 'results.csv', run_time, rampup, ts_interval, user_group_configs,
+                               report_mode=report_mode, node_summaries=node_summaries)
+
+    def report_summaries(self, summaries, output_dir):
+        """
+        the combined report from the summaries of the nodes (in the order of 
+        self.nodes) rather than their rows, with a summary of each node
+        """
+        for node, summary in zip(self.nodes, summaries):
+            node_dir = os.path.join(output_dir, 'nodes', self.node_name(node), '')
+            if not os.path.exists(node_dir):
+                os.makedirs(node_dir)
+            with open(node_dir + 'summary.json', 'w') as f:
+                json.dump(summary, f)
+        with open(os.path.join(output_dir, 'config.cfg'), 'w') as f:
+            f.write(self.values(self.client.call('get_config'))[0])
+        run_time, rampup, ts_interval, report_mode, user_group_configs = \
+            results.read_saved_config(os.path.join(output_dir, 'config.cfg'))
+        node_summaries = [results.node_summary('%s:%s' % node, results.SummaryResults([summary], run_time, ts_interval), run_time)
+                          for node, summary in zip(self.nodes, summaries)]
+        for ug_config in user_group_configs:
+            ug_config.num_threads *= len(self.nodes)
+        results.output_results(output_dir, None, run_time, rampup, ts_interval, user_group_configs,
+                               report_mode=report_mode, node_summaries=node_summaries,
+                               analysis=results.SummaryResults(summaries, run_time, ts_interval))
+
+    def streamed_summaries(self, timeout=30.0):
+        """the summaries the nodes pushed to the collector, once they have all pushed their last"""
+        names = ['%s:%s' % node for node in self.nodes]
+        deadline = time.time() + timeout
+        while not self.collector.all_done(names):
+            if time.time() > deadline:
+                raise ValueError('not all nodes pushed their results to the collector')
+            time.sleep(.1)
+        summaries = self.collector.summaries()
+        return [summaries[name] for name in names]
+
+    def run(self, output_dir=None, summary_only=False):
+        """
+        start, wait for, collect and report a test on all nodes, returns 
+        the output dir.  The report is made from the summaries the nodes 
+        pushed to the collector, if there is one, or with summary_only, 
+        from the summaries pulled from them after the run; otherwise from 
+        all their rows.
+        """
+        if output_dir is None:
+            output_dir = time.strftime('projects/' + self.project_name + '/results/grid_%Y.%m.%d_%H.%M.%S/')
+        try:
+            # the collector starts with the schedule, so it is stopped even if a node refuses it
+            try:
+                start_epoch = self.start()
+                print 'test starts on %i nodes at %s\n' % (len(self.nodes),
+                                                           time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_epoch)))
+                self.wait()
+                print '\ncollecting results...\n'
+                if self.collector is not None:
+                    summaries = self.streamed_summaries()
+                elif summary_only:
+                    summaries = self.values(self.client.run(lambda node: download_results_summary(node.proxy)))
+                else:
+                    summaries = None
+            finally:
+                if self.collector is not None:
+                    self.collector.stop()
+                    self.collector = None
+            if summaries is not None:
+                print 'analyzing results...\n'
+                self.report_summaries(summaries, output_dir)
+            else:
+                node_dirs = self.collect(output_dir)
+                self.merge(node_dirs, output_dir)
+                print 'analyzing results...\n'
+                self.report(node_dirs, output_dir)
+        finally:
+            self.client.close()
+        print 'created: %sresults.html\n' % output_dir
+        return output_dir
+
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog <project name> <host:port> [<host:port> ...] [options]')
+    parser.add_option('-d', '--start-delay', dest='start_delay', type='float', default=5.0,
+                      help='secs between scheduling the test and starting it (default 5)')
+    parser.add_option('-c', '--config', dest='config', help='config file to send to the nodes first')
+    parser.add_option('-o', '--output-dir', dest='output_dir', help='where to write the combined results')
+    parser.add_option('--collector', dest='collector',
+                      help='host:port (as the nodes reach this machine) to collect results pushed by the nodes on')
+    parser.add_option('-s', '--summary-only', dest='summary_only', action='store_true', default=False,
+                      help='collect only the aggregated results of the nodes, not their rows')
+    opts, args = parser.parse_args()
+    if len(args) < 2:
+        parser.print_help()
+        sys.exit(1)
+    nodes = [tuple(node.rsplit(':', 1)) for node in args[1:]]
+    coordinator = Coordinator(args[0], nodes, opts.start_delay, collector=opts.collector)
+    try:
+        if opts.config:
+            with open(opts.config) as f:
+                coordinator.update_configs(f.read())
+        coordinator.run(opts.output_dir and os.path.join(opts.output_dir, ''), opts.summary_only)
+    except socket.error, e:
+        sys.stderr.write('ERROR: can not make connection to a node: %s\n' % e)
+        sys.exit(1)
+    except ValueError, e:
+        sys.stderr.write('ERROR: %s\n' % e)
+        sys.exit(1)
+
+
+
+if __name__ == '__main__':
+    main()
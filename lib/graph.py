@@ -1,107 +1,180 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
-#  License: GNU LGPLv3
-#  
-#  This file is part of Multi-Mechanize
-
-
-import sys
-import itertools
-
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # use a non-GUI backend
-    from pylab import *
-except ImportError:
-    print 'ERROR: can not import Matplotlib. install Matplotlib to generate graphs'
-    
-
-def resp_graph(lines, points, line_below, boxplots, image_name, timer, dir='./'):
-    fig = figure(figsize=(8, 12))  # image dimensions
-    fig.suptitle('Timer: '+timer)
-    ax1 = fig.add_subplot(311)
-    # we don't share this axis because the boxplot makes a horrible axis
-    # TODO: we should just change that axis
-    ax2=fig.add_subplot(312,sharex=ax1)
-    ax3=fig.add_subplot(313,sharex=ax1)
-
-    ax=ax1
-    ax.set_title('Summary of '+timer,size='small')
-    #ax.set_xlabel('Elapsed Time In Test (secs)', size='x-small')
-    ax.set_ylabel('Response Time (secs)' , size='x-small')
-    ax.grid(True, color='#666666')
-    ax.tick_params(labelsize='x-small')
-
-    colors=itertools.cycle(['green','orange','purple'])
-    for label, line in lines:
-        x_seq = sorted(line.keys())
-        y_seq = [line[x] for x in x_seq]
-        c=colors.next()
-        ax.plot(x_seq, y_seq,
-                color=c, linestyle='-', linewidth=2.0, marker='o',
-                markeredgecolor=c, markerfacecolor='yellow', markersize=2.0,
-                label=label)
-
-    ax.legend(loc='best',
-              handlelength=1,
-              borderpad=1,
-              prop=matplotlib.font_manager.FontProperties(size='xx-small'))
-
-    ax.set_xlim(left=0)
-    ax.set_ylim(bottom=0)
-
-    ax=ax2
-    ax.set_title('Detail of '+timer,size='small')
-    #ax.set_xlabel('Elapsed Time In Test (secs)', size='x-small')
-    ax.set_ylabel('Response Time (secs)' , size='x-small')
-    ax.grid(True, color='#666666')
-    ax.tick_params(labelsize='x-small')
-
-    # Draw the actual timer values behind everything and almost transparent, 
-    # just as a backdrop
-    xseq,yseq=zip(*points[1])
-    ax.plot(xseq,yseq, alpha=.2,
-        color='gray', linestyle='-', linewidth=0.0, marker='o', 
-        markeredgecolor='gray', markerfacecolor='gray', markersize=2.0,zorder=-1)
-
-    pos, boxes=zip(*boxplots)
-    ax.boxplot(boxes, positions=pos)
-
-    colors=itertools.cycle(['green','orange','purple'])
-    for label, line in lines:
-        x_seq = sorted(line.keys())
-        y_seq = [line[x] for x in x_seq]
-        c=colors.next()
-        ax.plot(x_seq, y_seq,
-                color=c, linestyle='-', linewidth=1.0, marker='o',
-                markeredgecolor=c, markerfacecolor='yellow', markersize=1.0,
-                label=label)
-    ax.set_xlim(left=0)
-    ax.set_ylim(bottom=0)
-
-
-    ax=ax3
-    ax.set_title('Throughput of '+timer,size='small')
-    ax.set_xlabel('Elapsed Time In Test (secs)', size='x-small')
-    ax.set_ylabel('Timers Per Second (count)' , size='x-small')
-    ax.grid(True, color='#666666')
-    ax.tick_params(labelsize='x-small')
-
-    throughput_label, throughputs_dict=line_below
-    x_seq = sorted(throughputs_dict.keys())
-    y_seq = [throughputs_dict[x] for x in x_seq]
-    ax.plot(x_seq, y_seq, 
-        color='red', linestyle='-', linewidth=0.75, marker='o', 
-        markeredgecolor='red', markerfacecolor='yellow', markersize=2.0,
-             label=throughput_label)
-    ax.set_xlim(left=0)
-    ax.set_ylim(bottom=0)
-    
-    # We need to explicitly set the locator in order to override
-    # the tick positions from the boxplot
-    from matplotlib.ticker import AutoLocator
-    ax1.xaxis.set_major_locator(AutoLocator())
-    ax1.xaxis.set_minor_locator(AutoLocator())
-
-    savefig(dir + image_name)
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
+
+
+import sys
+import itertools
+import multiprocessing
+import numpy as np
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')  # use a non-GUI backend
+    from pylab import *
+except ImportError:
+    print 'ERROR: can not import Matplotlib. install Matplotlib to generate graphs'
+    
+
+def render_graphs(jobs, processes=None):
+    """
+    Render resp_graph() for each (args, kwargs) in jobs, one figure per 
+    task in a pool of processes (default: one per cpu).  With processes=1 
+    the graphs are rendered one after the other in this process.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(jobs))
+    if processes <= 1:
+        for job in jobs:
+            _render_graph(job)
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        pool.map(_render_graph, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _render_graph(job):
+    args, kwargs = job
+    resp_graph(*args, **kwargs)
+
+
+def decimate(points, columns, sample_size):
+    """
+    Reduce an array of [elapsed, value] points for a scatter plot 
+    columns pixels wide: the lowest and highest point in each pixel column 
+    (so the outline and the outliers survive), plus a uniform random 
+    sample of sample_size points (so the density does).  The points are 
+    returned in their original order.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    n = len(points)
+    if n <= 2 * columns + sample_size:
+        return points
+    x = points[:, 0]
+    span = x.max() - x.min()
+    if span > 0:
+        column = np.minimum(((x - x.min()) / span * columns).astype(int), columns - 1)
+    else:
+        column = np.zeros(n, dtype=int)
+    # group by column, then find the first lowest and highest value in each group
+    order = column.argsort()
+    column = column[order]
+    values = points[order, 1]
+    starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    group = np.repeat(np.arange(len(starts)), counts)
+    keep = [np.random.choice(n, sample_size, replace=False)]
+    for extreme in (np.minimum, np.maximum):
+        at_extreme = np.flatnonzero(values == np.repeat(extreme.reduceat(values, starts), counts))
+        keep.append(order[at_extreme[np.unique(group[at_extreme], return_index=True)[1]]])
+    return points[np.unique(np.concatenate(keep))]
+
+
+def resp_graph(lines, points, line_below, boxplots, image_name, timer, dir='./', max_points=None):
+    """
+    The raw points in the backdrop of the detail plot are decimated to 
+    the min and max of each pixel column plus a sample of max_points 
+    (default 2000).  boxplots are (position, stats) pairs, where stats is 
+    either a dict of boxplot statistics for Axes.bxp() or a list of values.
+    """
+    if max_points is None:
+        max_points = 2000
+    fig = figure(figsize=(8, 12))  # image dimensions
+    fig.suptitle('Timer: '+timer)
+    ax1 = fig.add_subplot(311)
+    # we don't share this axis because the boxplot makes a horrible axis
+    # TODO: we should just change that axis
+    ax2=fig.add_subplot(312,sharex=ax1)
+    ax3=fig.add_subplot(313,sharex=ax1)
+
+    ax=ax1
+    ax.set_title('Summary of '+timer,size='small')
+    #ax.set_xlabel('Elapsed Time In Test (secs)', size='x-small')
+    ax.set_ylabel('Response Time (secs)' , size='x-small')
+    ax.grid(True, color='#666666')
+    ax.tick_params(labelsize='x-small')
+
+    colors=itertools.cycle(['green','orange','purple'])
+    for label, line in lines:
+        x_seq = sorted(line.keys())
+        y_seq = [line[x] for x in x_seq]
+        c=colors.next()
+        ax.plot(x_seq, y_seq,
+                color=c, linestyle='-', linewidth=2.0, marker='o',
+                markeredgecolor=c, markerfacecolor='yellow', markersize=2.0,
+                label=label)
+
+    ax.legend(loc='best',
+              handlelength=1,
+              borderpad=1,
+              prop=matplotlib.font_manager.FontProperties(size='xx-small'))
+
+    ax.set_xlim(left=0)
+    ax.set_ylim(bottom=0)
+
+    ax=ax2
+    ax.set_title('Detail of '+timer,size='small')
+    #ax.set_xlabel('Elapsed Time In Test (secs)', size='x-small')
+    ax.set_ylabel('Response Time (secs)' , size='x-small')
+    ax.grid(True, color='#666666')
+    ax.tick_params(labelsize='x-small')
+
+    # Draw the actual timer values behind everything and almost transparent, 
+    # just as a backdrop
+    backdrop = decimate(points[1], int(ax.get_window_extent().width), max_points)
+    xseq, yseq = backdrop[:, 0], backdrop[:, 1]
+    ax.plot(xseq,yseq, alpha=.2,
+        color='gray', linestyle='-', linewidth=0.0, marker='o', 
+        markeredgecolor='gray', markerfacecolor='gray', markersize=2.0,zorder=-1)
+
+    pos, boxes=zip(*boxplots)
+    # drawing from precomputed statistics, rather than from all the values
+    ax.bxp([box if isinstance(box, dict) else matplotlib.cbook.boxplot_stats(np.asarray(box))[0] 
+            for box in boxes], positions=pos)
+
+    colors=itertools.cycle(['green','orange','purple'])
+    for label, line in lines:
+        x_seq = sorted(line.keys())
+        y_seq = [line[x] for x in x_seq]
+        c=colors.next()
+        ax.plot(x_seq, y_seq,
+                color=c, linestyle='-', linewidth=1.0, marker='o',
+                markeredgecolor=c, markerfacecolor='yellow', markersize=1.0,
+                label=label)
+    ax.set_xlim(left=0)
+    ax.set_ylim(bottom=0)
+
+
+    ax=ax3
+    ax.set_title('Throughput of '+timer,size='small')
+    ax.set_xlabel('Elapsed Time In Test (secs)', size='x-small')
+    ax.set_ylabel('Timers Per Second (count)' , size='x-small')
+    ax.grid(True, color='#666666')
+    ax.tick_params(labelsize='x-small')
+
+    throughput_label, throughputs_dict=line_below
+    x_seq = sorted(throughputs_dict.keys())
+    y_seq = [throughputs_dict[x] for x in x_seq]
+    ax.plot(x_seq, y_seq, 
+        color='red', linestyle='-', linewidth=0.75, marker='o', 
+        markeredgecolor='red', markerfacecolor='yellow', markersize=2.0,
+             label=throughput_label)
+    ax.set_xlim(left=0)
+    ax.set_ylim(bottom=0)
+    
+    # We need to explicitly set the locator in order to override
+    # the tick positions from the boxplot
+    from matplotlib.ticker import AutoLocator
+    ax1.xaxis.set_major_locator(AutoLocator())
+    ax1.xaxis.set_minor_locator(AutoLocator())
+
+    fig.savefig(dir + image_name)
+    # pyplot keeps every figure alive until it is closed
+    close(fig)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""
+client side of the remote management api, for controlling many nodes
+
+A GridClient keeps a persistent (HTTP/1.1) xml-rpc connection and a
+worker thread per node, and fans each command out to all nodes at once:
+a slow or dead node costs its own timeout, not everyone else's.
+
+    client = GridClient([('192.168.1.2', 9001), ('192.168.1.3', 9001)])
+    for reply in client.call('get_status'):
+        print reply.node, reply.value, reply.error, reply.latency
+    client.close()
+"""
+
+import Queue
+import threading
+import time
+import xmlrpclib
+
+
+
+class TimeoutTransport(xmlrpclib.Transport):
+    """an xml-rpc transport whose (kept alive) connections time out after timeout secs"""
+    def __init__(self, timeout):
+        xmlrpclib.Transport.__init__(self)
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = xmlrpclib.Transport.make_connection(self, host)
+        conn.timeout = self.timeout
+        return conn
+
+
+
+class GridNode(object):
+    """one node, with its own connection.  only its worker thread should use the proxy."""
+    def __init__(self, host, port, timeout=10.0):
+        self.host = host
+        self.port = int(port)
+        self.name = '%s:%s' % (host, port)
+        self.proxy = xmlrpclib.ServerProxy('http://%s:%s' % (host, port), TimeoutTransport(timeout), allow_none=True)
+        self.latency = None  # secs the last call took
+
+    def call(self, method, *args):
+        start = time.time()
+        try:
+            return getattr(self.proxy, method)(*args)
+        finally:
+            self.latency = time.time() - start
+
+
+
+class Reply(object):
+    """
+    the outcome of a command on one node: its value, or the error it
+    failed with, when it was sent and how long it took (secs)
+    """
+    def __init__(self, node, value=None, error=None, sent=None, latency=None):
+        self.node = node
+        self.value = value
+        self.error = error
+        self.sent = sent
+        self.latency = latency
+
+    def __repr__(self):
+        return '<Reply %s: %r%s (%.1fms)>' % (self.node.name, self.value,
+                                               ' error: %s' % self.error if self.error else '',
+                                               (self.latency or 0) * 1000)
+
+
+
+class GridClient(object):
+    """
+    Fans commands out to nodes, a list of (host, port).  Every call
+    returns a Reply per node, in the order of nodes, once all nodes have
+    replied, failed or timed out (after timeout secs).
+    """
+    def __init__(self, nodes, timeout=10.0):
+        self.timeout = timeout
+        self.nodes = [GridNode(host, port, timeout) for host, port in nodes]
+        self.lock = threading.Lock()  # between a reply timing out and its late result coming in
+        self.queues = []
+        self.workers = []
+        for node in self.nodes:
+            queue = Queue.Queue()
+            worker = threading.Thread(target=self.__work, args=(node, queue))
+            worker.daemon = True
+            worker.start()
+            self.queues.append(queue)
+            self.workers.append(worker)
+
+    def __work(self, node, queue):
+        while True:
+            job = queue.get()
+            if job is None:
+                node.proxy('close')()  # the kept alive connection
+                return
+            func, reply, done = job
+            sent = time.time()
+            value = error = None
+            try:
+                value = func(node)
+            except Exception, e:  # whatever went wrong, the caller gets its reply
+                error = str(e) or e.__class__.__name__
+            latency = time.time() - sent
+            with self.lock:
+                # a reply that timed out has gone back to the caller as it was
+                if reply.error is None:
+                    reply.sent, reply.value, reply.error, reply.latency = sent, value, error, latency
+                done.set()
+
+    def run(self, func, timeout=None):
+        """
+        run func(node) on every node at once, returns a Reply per node.  
+        without a timeout, waits for all of them (each xml-rpc call still 
+        times out on its own).
+        """
+        jobs = []
+        for node, queue in zip(self.nodes, self.queues):
+            job = (func, Reply(node), threading.Event())
+            queue.put(job)
+            jobs.append(job)
+        if timeout is not None:
+            deadline = time.time() + timeout
+        for func, reply, done in jobs:
+            if timeout is None:
+                while not done.wait(1):  # in steps, so ctrl-c gets through
+                    pass
+            elif not done.wait(max(0, deadline - time.time())):
+                with self.lock:
+                    if not done.is_set():
+                        reply.error = 'timed out'
+        return [reply for func, reply, done in jobs]
+
+    def call(self, method, *args):
+        """call an xml-rpc method with the same args on every node"""
+        return self.run(lambda node: node.call(method, *args), self.timeout)
+
+    def call_each(self, method, args_of):
+        """call an xml-rpc method on every node, with the args args_of(node)"""
+        return self.run(lambda node: node.call(method, *args_of(node)), self.timeout)
+
+    def close(self, timeout=1.0):
+        """stop the workers, waiting up to timeout secs for those not stuck on a node"""
+        for queue in self.queues:
+            queue.put(None)
+        deadline = time.time() + timeout
+        for worker in self.workers:
+            worker.join(max(0, deadline - time.time()))
+
+
+
+def failures(replies):
+    """the replies that failed, as 'host:port: error' lines"""
+    return '\n'.join('%s: %s' % (reply.node.name, reply.error) for reply in replies if reply.error is not None)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""mergeable, log-bucketed latency histograms"""
+
+import math
+import numpy as np
+
+
+
+class LatencyHistogram(object):
+    """
+    Histogram of latencies in logarithmically sized buckets, so any
+    percentile can be read back with a relative error of at most
+    relative_accuracy, in time proportional to the number of buckets.
+
+    Bucket k counts the values in (gamma**(k-1), gamma**k], where
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy).  Values at or
+    below min_value (including zero and negative values) share one bucket.
+    Count, mean, variance, min and max are tracked exactly.
+
+    Histograms with the same relative_accuracy and min_value can be merged,
+    e.g. to combine intervals, user groups or nodes, and the result is the
+    same as if all values had been added to one histogram.
+    """
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket index -> count
+        self.zero_count = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def __len__(self):
+        return self.count
+
+    def __combine_moments(self, count, mean, m2, min_value, max_value):
+        # Chan et al.'s parallel variance, which stays accurate when the
+        # values are small compared to their mean
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min = min(self.min, min_value)
+        self.max = max(self.max, max_value)
+
+    def add(self, value):
+        if value <= self.min_value:
+            self.zero_count += 1
+        else:
+            k = int(math.ceil(math.log(value) / self.log_gamma))
+            self.buckets[k] = self.buckets.get(k, 0) + 1
+        self.__combine_moments(1, value, 0.0, value, value)
+
+    def add_array(self, values):
+        """add an array of values at once"""
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        positive = values[values > self.min_value]
+        self.zero_count += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(int), return_counts=True)
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            self.buckets[k] = self.buckets.get(k, 0) + c
+        mean = values.mean()
+        self.__combine_moments(len(values), mean, ((values - mean) ** 2).sum(), values.min(), values.max())
+
+    @staticmethod
+    def add_grouped(histograms, groups, values):
+        """
+        Add values[i] to histograms[groups[i]] for every i: the same as
+        add_array() on each histogram, in one pass over all of the values.
+        The histograms must share a bucket layout.
+        """
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        first = histograms[0]
+        groups = np.asarray(groups)
+        if len(groups) > 1 and (groups[1:] < groups[:-1]).any():
+            order = groups.argsort(kind='mergesort')
+            groups = groups[order]
+            values = values[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        counts = np.diff(np.r_[starts, len(values)])
+        positive = values > first.min_value
+        zeros = np.add.reduceat((~positive).astype(int), starts)
+        if positive.any():
+            # count the values of every (group, bucket) at once, as one integer
+            keys = np.ceil(np.log(values[positive]) / first.log_gamma).astype(np.int64)
+            low = keys.min()
+            span = keys.max() - low + 1
+            pairs, pair_counts = np.unique(groups[positive].astype(np.int64) * span + (keys - low), return_counts=True)
+            pair_groups, pair_keys = np.divmod(pairs, span)
+            pair_keys = (pair_keys + low).tolist()
+            pair_counts = pair_counts.tolist()
+            bounds = np.flatnonzero(np.r_[True, pair_groups[1:] != pair_groups[:-1], True]).tolist()
+            for g, start, end in zip(pair_groups[bounds[:-1]].tolist(), bounds[:-1], bounds[1:]):
+                buckets = histograms[g].buckets
+                if not buckets:
+                    histograms[g].buckets = dict(zip(pair_keys[start:end], pair_counts[start:end]))
+                else:
+                    for k, c in zip(pair_keys[start:end], pair_counts[start:end]):
+                        buckets[k] = buckets.get(k, 0) + c
+        means = np.add.reduceat(values, starts) / counts
+        deviations = values - np.repeat(means, counts)
+        m2s = np.add.reduceat(deviations * deviations, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        for g, count, zero_count, mean, m2, min_value, max_value in zip(
+                groups[starts].tolist(), counts.tolist(), zeros.tolist(), means.tolist(), 
+                m2s.tolist(), mins.tolist(), maxs.tolist()):
+            hist = histograms[g]
+            hist.zero_count += zero_count
+            hist.__combine_moments(count, mean, m2, min_value, max_value)
+
+    def merge(self, other):
+        """add all of the values of another histogram to this one"""
+        if (other.relative_accuracy, other.min_value) != (self.relative_accuracy, self.min_value):
+            raise ValueError('can not merge histograms with different bucket layouts')
+        if other.count == 0:
+            return
+        for k, c in other.buckets.iteritems():
+            self.buckets[k] = self.buckets.get(k, 0) + c
+        self.zero_count += other.zero_count
+        self.__combine_moments(other.count, other.mean, other.m2, other.min, other.max)
+
+    @classmethod
+    def merged(cls, histograms):
+        """
+        A histogram of all of the values of the histograms: the same as
+        merge() of each into an empty one, in one pass over all of their
+        buckets.  The histograms must share a bucket layout.
+        """
+        if not histograms:
+            return cls()
+        first = histograms[0]
+        hist = cls(first.relative_accuracy, first.min_value)
+        if any((other.relative_accuracy, other.min_value) != (hist.relative_accuracy, hist.min_value) for other in histograms):
+            raise ValueError('can not merge histograms with different bucket layouts')
+        keys = []
+        bucket_counts = []
+        for other in histograms:
+            keys.extend(other.buckets.iterkeys())
+            bucket_counts.extend(other.buckets.itervalues())
+        if keys:
+            # the keys span a few thousand buckets at most, so count them in a dense array
+            keys = np.array(keys, dtype=np.int64)
+            low = keys.min()
+            totals = np.bincount(keys - low, np.array(bucket_counts, dtype=float))
+            nonzero = np.flatnonzero(totals)
+            hist.buckets = dict(zip((nonzero + low).tolist(), totals[nonzero].astype(np.int64).tolist()))
+        hist.zero_count = sum(other.zero_count for other in histograms)
+        counts = np.array([other.count for other in histograms], dtype=float)
+        total = counts.sum()
+        if total:
+            means = np.array([other.mean for other in histograms])
+            mean = (counts * means).sum() / total
+            # the m2 of each, plus the spread of their means around the overall mean
+            m2 = sum(other.m2 for other in histograms) + (counts * (means - mean) ** 2).sum()
+            hist.__combine_moments(int(total), mean, m2, min(other.min for other in histograms),
+                                   max(other.max for other in histograms))
+        return hist
+
+    def stdev(self):
+        """sample standard deviation"""
+        if self.count < 2:
+            return float('nan')
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def percentiles(self, pct):
+        """
+        Returns the value at each percentile in pct (0-100), using the
+        nearest rank.  The min and max are exact; other values are within
+        relative_accuracy of the true value.
+        """
+        if self.count == 0:
+            return [float('nan')] * len(pct)
+        ranks = sorted((int(round(p / 100.0 * (self.count - 1))), i) for i, p in enumerate(pct))
+        results = [None] * len(pct)
+        keys = iter(sorted(self.buckets))
+        seen = self.zero_count
+        value = 0.0
+        for rank, i in ranks:
+            while seen <= rank:
+                k = keys.next()
+                seen += self.buckets[k]
+                value = 2 * self.gamma ** k / (self.gamma + 1)
+            if rank == 0:
+                results[i] = self.min
+            elif rank == self.count - 1:
+                results[i] = self.max
+            else:
+                results[i] = min(max(value, self.min), self.max)
+        return results
+
+    @staticmethod
+    def percentiles_of(histograms, pct):
+        """
+        The same as percentiles(pct) of each of the histograms, as an array
+        of len(histograms) x len(pct), in one pass over all of their
+        buckets.  The histograms must share a bucket layout.
+        """
+        if not histograms:
+            return np.zeros((0, len(pct)))
+        gamma = histograms[0].gamma
+        # every histogram's zero bucket (valued 0.0), then its buckets in order
+        keys = []
+        bucket_counts = []
+        zero_buckets = []
+        for hist in histograms:
+            sorted_keys = sorted(hist.buckets)
+            zero_buckets.append(len(keys))
+            keys.append(0)
+            keys.extend(sorted_keys)
+            bucket_counts.append(hist.zero_count)
+            bucket_counts.extend(map(hist.buckets.__getitem__, sorted_keys))
+        values = 2 * gamma ** np.array(keys, dtype=float) / (gamma + 1)
+        values[zero_buckets] = 0.0
+        cumulative = np.cumsum(bucket_counts)
+        counts = np.array([hist.count for hist in histograms])
+        offsets = np.r_[0, np.cumsum(counts)[:-1]]
+        mins = np.array([hist.min for hist in histograms])
+        maxs = np.array([hist.max for hist in histograms])
+        
+        # nearest ranks, rounded half up like round()
+        ranks = np.floor(np.asarray(pct, dtype=float)[np.newaxis, :] / 100.0 * (counts[:, np.newaxis] - 1) + 0.5).astype(int)
+        ranks = np.maximum(ranks, 0)
+        # the first bucket of each histogram holding more values than the rank
+        index = np.minimum(cumulative.searchsorted(offsets[:, np.newaxis] + ranks, side='right'), len(values) - 1)
+        results = np.minimum(np.maximum(values[index], mins[:, np.newaxis]), maxs[:, np.newaxis])
+        results = np.where(ranks == 0, mins[:, np.newaxis], results)
+        results = np.where(ranks == counts[:, np.newaxis] - 1, maxs[:, np.newaxis], results)
+        results[counts == 0] = np.nan
+        return results
+
+    def percentile(self, p):
+        return self.percentiles([p])[0]
+
+    def to_dict(self):
+        """a json-friendly representation, see from_dict()"""
+        return dict(relative_accuracy=self.relative_accuracy, min_value=self.min_value,
+                    buckets=[[k, c] for k, c in sorted(self.buckets.iteritems())],
+                    zero_count=self.zero_count, count=self.count, mean=self.mean, m2=self.m2,
+                    min=self.min if self.count else None, max=self.max if self.count else None)
+
+    @classmethod
+    def from_dict(cls, d):
+        hist = cls(d['relative_accuracy'], d['min_value'])
+        hist.buckets = dict((int(k), int(c)) for k, c in d['buckets'])
+        hist.zero_count = d['zero_count']
+        hist.count = d['count']
+        hist.mean = d['mean']
+        hist.m2 = d['m2']
+        if hist.count:
+            hist.min = d['min']
+            hist.max = d['max']
+        return hist
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""rolling, windowed timer statistics while a test is running"""
+
+import BaseHTTPServer
+import threading
+import time
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from histogram import LatencyHistogram
+
+
+
+class LiveStats(object):
+    """
+    Throughput, percentiles and error rate of every timer over the last
+    window_secs seconds.  Values are added to a LatencyHistogram per timer
+    per bucket_secs slot; a snapshot merges the slots in the window.
+    """
+    def __init__(self, window_secs=10, bucket_secs=.25):
+        self.window_secs = window_secs
+        self.bucket_secs = bucket_secs
+        self.lock = threading.Lock()
+        self.slots = {}  # slot number -> {timer name: LatencyHistogram}
+        self.errors = {}  # slot number -> error count
+        self.first_slot = None  # the slot of the first values added
+        self.trans_count = 0
+        self.error_count = 0
+
+    def add(self, timer_values, num_errors, now=None):
+        """
+        Add the values of a batch of results: timer_values maps timer name
+        to a list of values (the "Transactions" timer included).
+        """
+        if now is None:
+            now = time.time()
+        slot = int(now // self.bucket_secs)
+        with self.lock:
+            if self.first_slot is None:
+                self.first_slot = slot
+            histograms = self.slots.setdefault(slot, {})
+            for timer_name, values in timer_values.iteritems():
+                if timer_name not in histograms:
+                    histograms[timer_name] = LatencyHistogram()
+                histograms[timer_name].add_array(values)
+            self.errors[slot] = self.errors.get(slot, 0) + num_errors
+            self.trans_count += len(timer_values.get('Transactions', ()))
+            self.error_count += num_errors
+            # forget slots that have left the window
+            oldest = slot - int(self.window_secs / self.bucket_secs)
+            for old_slot in [s for s in self.slots if s <= oldest]:
+                del self.slots[old_slot]
+                self.errors.pop(old_slot, None)
+
+    def snapshot(self, now=None):
+        """the windowed stats, as a json-friendly dict"""
+        if now is None:
+            now = time.time()
+        oldest = int(now // self.bucket_secs) - int(self.window_secs / self.bucket_secs)
+        merged = {}
+        errors = 0
+        with self.lock:
+            for slot, histograms in self.slots.iteritems():
+                if slot <= oldest:
+                    continue
+                errors += self.errors.get(slot, 0)
+                for timer_name, hist in histograms.iteritems():
+                    if timer_name not in merged:
+                        merged[timer_name] = LatencyHistogram()
+                    merged[timer_name].merge(hist)
+            trans_count = self.trans_count
+            error_count = self.error_count
+            first_slot = self.first_slot
+        # the secs the window's slots cover: until the window is full, only 
+        # since the first values came in
+        if first_slot is None:
+            secs = self.window_secs
+        else:
+            secs = now - max(oldest + 1, first_slot) * self.bucket_secs
+        timers = {}
+        for timer_name, hist in merged.iteritems():
+            p50, p95, p99 = hist.percentiles([50, 95, 99])
+            timers[timer_name] = dict(count=hist.count,
+                                      throughput=hist.count / secs if secs > 0 else 0.0,
+                                      avg=hist.mean, p50=p50, p95=p95, p99=p99, max=hist.max)
+        window_trans = merged['Transactions'].count if 'Transactions' in merged else 0
+        return dict(time=now,
+                    window_secs=self.window_secs,
+                    transactions=trans_count,
+                    errors=error_count,
+                    error_rate=errors / float(window_trans) if window_trans else 0.0,
+                    timers=timers)
+
+
+
+class LiveStatsServer(threading.Thread):
+    """serves LiveStats snapshots as json over http, on the local machine only"""
+    def __init__(self, live_stats, port, host='127.0.0.1'):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        live_stats_ = live_stats
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(live_stats_.snapshot())
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep the console for the progress line
+
+        self.server = BaseHTTPServer.HTTPServer((host, port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
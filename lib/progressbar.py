@@ -1,35 +1,35 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
-#  License: GNU LGPLv3
-#  
-#  This file is part of Multi-Mechanize
-
-
-
-class ProgressBar(object):
-    def __init__(self, duration):
-        self.duration = duration
-        self.prog_bar = '[]'
-        self.fill_char = '='
-        self.width = 40
-        self.__update_amount(0)
-    
-    def __update_amount(self, new_amount):
-        percent_done = int(round((new_amount / 100.0) * 100.0))
-        if percent_done > 100:
-            percent_done = 100
-        all_full = self.width - 2
-        num_hashes = int(round((percent_done / 100.0) * all_full))
-        self.prog_bar = '[' + self.fill_char * num_hashes + ' ' * (all_full - num_hashes) + ']'
-        pct_place = (len(self.prog_bar) / 2) - len(str(percent_done))
-        pct_string = '%i%%' % percent_done
-        self.prog_bar = self.prog_bar[0:pct_place] + \
-            (pct_string + self.prog_bar[pct_place + len(pct_string):])
-        
-    def update_time(self, elapsed_secs):
-        self.__update_amount((elapsed_secs / float(self.duration)) * 100.0)
-        self.prog_bar += '  %ds/%ss' % (elapsed_secs, self.duration)
-        
-    def __str__(self):
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
+
+
+
+class ProgressBar(object):
+    def __init__(self, duration):
+        self.duration = duration
+        self.prog_bar = '[]'
+        self.fill_char = '='
+        self.width = 40
+        self.__update_amount(0)
+    
+    def __update_amount(self, new_amount):
+        percent_done = int(round((new_amount / 100.0) * 100.0))
+        if percent_done > 100:
+            percent_done = 100
+        all_full = self.width - 2
+        num_hashes = int(round((percent_done / 100.0) * all_full))
+        self.prog_bar = '[' + self.fill_char * num_hashes + ' ' * (all_full - num_hashes) + ']'
+        pct_place = (len(self.prog_bar) / 2) - len(str(percent_done))
+        pct_string = '%i%%' % percent_done
+        self.prog_bar = self.prog_bar[0:pct_place] + \
+            (pct_string + self.prog_bar[pct_place + len(pct_string):])
+        
+    def update_time(self, elapsed_secs):
+        self.__update_amount((elapsed_secs / float(self.duration)) * 100.0)
+        self.prog_bar += '  %ds/%ss' % (elapsed_secs, self.duration)
+        
+    def __str__(self):
         return str(self.prog_bar)
\ No newline at end of file
@@ -1,241 +1,879 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
-#  License: GNU LGPLv3
-#  
-#  This file is part of Multi-Mechanize
-
-
-import time
-from collections import defaultdict
-import graph
-import numpy as np
-from itertools import groupby
-import csv
-from operator import itemgetter
-
-# first try to import a fast newer version of simplejson
-try:
-    import simplejson as json
-except ImportError:
-    # fall back to the old, slow library version
-    import json
-
-
-def timer_table_vals(timer, interval_secs):
-    timer_vals=timer[:,1].copy() # must make a copy so we don't sort timer
-    timer_vals.sort()
-    n=len(timer_vals)
-    graphs={}
-    graphs['pct_50_resptime'] = {}
-    graphs['pct_80_resptime'] = {}  
-    graphs['pct_95_resptime'] = {}  
-
-    summary=dict(count=n,
-                 min=timer_vals[0],
-                 avg=np.average(timer_vals),
-                 max=timer_vals[-1],
-                 stdev=timer_vals.std(ddof=1)) #sample standard deviation
-    pct=[25,50,80,90,95]
-    for p,q in zip(pct,np.percentile(timer_vals, pct)):
-        summary['pct_%s'%p]=q
-
-    splat_series = group_series(timer, interval_secs)
-    timer_table=[]
-    for i, bucket in splat_series:
-        cnt = len(bucket)
-        if cnt == 0:
-            row=dict(interval=i, count=0, rate=0, min='N/A', avg='N/A',pct_80='N/A',pct_90='N/A',pct_95='N/A',max='N/A',stdev='N/A')
-        else:
-            bucket.sort()
-            row=dict()
-            row['interval'] = i
-            row['count'] = cnt
-            row['rate'] = cnt / float(interval_secs)
-            row['min'] = bucket[0]
-            row['avg'] = np.average(bucket)
-            row['max'] = bucket[-1]
-            row['stdev'] = np.std(bucket, ddof=1) # sample stdev
-            # not exactly percentiles, since I'm not averaging values if 
-            # the percentile doesn't fall exactly on a slot.
-            pct=[25,50,80,90,95]
-            for p,q in zip(pct,np.percentile(bucket, pct)):
-                row['pct_%s'%p]=q
-
-        timer_table.append(row)
-
-        # graph data
-        graphs['pct_50_resptime'][i] = row['pct_50']
-        graphs['pct_80_resptime'][i] = row['pct_80']
-        graphs['pct_95_resptime'][i] = row['pct_95']
-
-    return summary, timer_table, graphs, splat_series   
-
-def output_results(results_dir, results_file, run_time, rampup, ts_interval, user_group_configs=[], project_config_data=''):
-    from jinja2 import Template
-    from jinja2 import Environment, FileSystemLoader
-    # change this to PackageLoader when we get an installable package
-    env = Environment(loader=FileSystemLoader('lib/templates'))
-    template = env.get_template('results_template.html')
-    template_vars=dict()
-    
-    results = Results(results_dir + results_file, run_time)
-    
-    print 'transactions: %i' % results.total_transactions
-    print 'errors: %i' % results.total_errors
-    print ''
-    print 'test start: %s' % results.start_datetime
-    print 'test finish: %s' % results.finish_datetime
-    print ''
-    
-    template_vars['total_transactions']=results.total_transactions
-    template_vars['total_errors']=results.total_errors
-    template_vars['run_time']=run_time
-    template_vars['rampup']=rampup
-    template_vars['test_start']=results.start_datetime
-    template_vars['test_finish']=results.finish_datetime
-    template_vars['timeseries_interval']=ts_interval
-    template_vars['user_group_configs']=user_group_configs
-    template_vars['project_config_data']=project_config_data
-
-    # Make the "Transactions" timer just another custom timer
-    template_vars['timers']={}
-    template_vars['graph_filenames']={}
-    results.uniq_timer_names.add('Transactions')
-    for resp_stats in results.resp_stats_list:
-        resp_stats.custom_timers['Transactions']=resp_stats.trans_time
-
-    start_time=results.epoch_start
-    for timer_string in sorted(results.uniq_timer_names):
-        timer_points = []  # [elapsed, timervalue]
-        for resp_stats in results.resp_stats_list:
-            try:
-                val = resp_stats.custom_timers[timer_string]
-                # the values in a custom timer can either be:
-                # (1) a single time delta (assumed to occur at the start of the transaction)
-                # (2) a list of time deltas (all assumed to occur at the start of the transaction)
-                # (3) (exact time, time delta) tuples
-                if not isinstance(val, (list, tuple)):
-                    # case (1) 
-                    val=[(resp_stats.elapsed_time, val)]
-                elif not isinstance(val[0], (list, tuple)):
-                    # case (2)
-                    val=[(resp_stats.elapsed_time, v) for v in val]
-                else:
-                    # case (3) -- need to change the exact time to a relative time
-                    val=[(t-start_time, v) for t,v in val]
-                # now val is a list of (time since start of run, time delta)
-                timer_points.extend(val)
-            except (KeyError,IndexError):
-                pass
-        timer_points=np.asarray(timer_points,dtype=float)
-
-        template_vars['timers'][timer_string]={}
-        template_vars['timers'][timer_string]['s'],template_vars['timers'][timer_string]['table'],graph_data, splat_series=timer_table_vals(timer_points.copy(), ts_interval)
-
-        template_vars['graph_filenames'][timer_string]={}
-        template_vars['graph_filenames'][timer_string]['resptime']=timer_string+'_response_times_intervals.png'
-        template_vars['graph_filenames'][timer_string]['resptime_all']=timer_string+'_response_times.png'
-        template_vars['graph_filenames'][timer_string]['throughput']=timer_string+'_throughput.png'
-
-        interval_secs=5.0
-        bins=np.arange(0,run_time+interval_secs, interval_secs)
-        hist,bins=np.histogram(timer_points[:,0],bins)
-        throughput_points=dict(zip(bins,hist/interval_secs))
-
-        graph.resp_graph((('95%', graph_data['pct_95_resptime'],),
-                          ('80%', graph_data['pct_80_resptime']), 
-                          ('Median',graph_data['pct_50_resptime'])), 
-                         ('All timers', timer_points),
-                         ('Throughput', throughput_points),
-                         splat_series,
-                         template_vars['graph_filenames'][timer_string]['resptime'], 
-                         timer=timer_string,
-                         dir=results_dir)
-
-
-
-
-    import os
-    with open(os.path.join(results_dir, 'results.html'), 'w') as f:
-        f.write(template.render(**template_vars))
-
-
-class Results(object):
-    def __init__(self, results_file_name, run_time):
-        self.results_file_name = results_file_name
-        self.run_time = run_time
-        self.total_transactions = 0
-        self.total_errors = 0
-        self.uniq_timer_names = set()
-        self.uniq_user_group_names = set()
-        
-        self.resp_stats_list = self.__parse_file()
-        
-        self.epoch_start = self.resp_stats_list[0].epoch_secs
-        self.epoch_finish = self.resp_stats_list[-1].epoch_secs
-        self.start_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.epoch_start))
-        self.finish_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.epoch_finish))
-        
-        
-        
-    def __parse_file(self):
-        f = csv.reader(open(self.results_file_name, 'rb'))
-        resp_stats_list = []
-        for fields in f:
-            request_num = int(fields[0])
-            elapsed_time = float(fields[1])
-            epoch_secs = float(fields[2])
-            user_group_name = fields[3]
-            trans_time = float(fields[4])
-            error = fields[5]
-            
-            self.uniq_user_group_names.add(user_group_name)
-            
-            custom_timers = json.loads(fields[6])
-            self.uniq_timer_names.update(custom_timers.keys())
-            
-            r = ResponseStats(request_num, elapsed_time, epoch_secs, user_group_name, trans_time, error, custom_timers)
-            
-            if elapsed_time < self.run_time:  # drop all times that appear after the last request was sent (incomplete interval)
-                resp_stats_list.append(r)
-            
-            if error != '':
-                self.total_errors += 1
-                
-            self.total_transactions += 1
-            
-        return resp_stats_list    
-   
-
-
-class ResponseStats(object):
-    def __init__(self, request_num, elapsed_time, epoch_secs, user_group_name, trans_time, error, custom_timers):
-        self.request_num = request_num
-        self.elapsed_time = elapsed_time
-        self.epoch_secs = epoch_secs
-        self.user_group_name = user_group_name
-        self.trans_time = trans_time
-        self.error = error
-        self.custom_timers = custom_timers
-        
-
-
-def group_series(points, interval):
-    """
-    Returns [key, [list of values]], where key is the maximal step
-    below each of the corresponding values.
-
-    This function may sort points.
-    """
-    points=np.asarray(points,dtype=float)
-    points[:,0]=interval*((points[:,0]-points[0,0])//interval)
-    # sort points by first column, then group by first column
-    points=points[points[:,0].argsort(),]
-    grouping=[(key,map(itemgetter(1), values))
-            for key,values in groupby(points,itemgetter(0))]
-    return grouping
-    
-
-if __name__ == '__main__':
-    output_results('./', 'results.csv', 120, 1, 5)
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
+
+
+import ConfigParser
+import cPickle as pickle
+import os
+import sys
+import time
+from collections import defaultdict
+import graph
+import numpy as np
+from histogram import LatencyHistogram
+from resultsstore import ResultsStore, TIMER_TIMED
+import csv
+
+# first try to import a fast newer version of simplejson
+try:
+    import simplejson as json
+except ImportError:
+    # fall back to the old, slow library version
+    import json
+
+
+PERCENTILES = [25, 50, 80, 90, 95]
+
+# the analysis accumulates in intervals of this many secs, and rolls them up 
+# to the ts_interval (when the ts_interval is a multiple of it)
+BASE_INTERVAL_SECS = 1
+
+# the analysis state that lets output_results() pick up where it left off
+CHECKPOINT_FILE = 'results_checkpoint.pickle'
+CHECKPOINT_VERSION = 4
+
+# the interval columns written for the interactive report
+REPORT_COLUMNS = ['interval', 'count', 'rate', 'min', 'avg', 'max', 'pct_50', 'pct_80', 'pct_95']
+# the interactive report rolls intervals up, doubling them, until at most this many are left
+REPORT_MIN_INTERVALS = 50
+
+
+def histogram_stats(hist):
+    """count, min, avg, max, stdev and PERCENTILES of a LatencyHistogram"""
+    stats = dict(count=hist.count,
+                 min=hist.min,
+                 avg=hist.mean,
+                 max=hist.max,
+                 stdev=hist.stdev()) # sample standard deviation
+    for p, q in zip(PERCENTILES, hist.percentiles(PERCENTILES)):
+        stats['pct_%s' % p] = q
+    return stats
+
+
+def box_stats(q1, med, q3, min_value, max_value, mean, sample):
+    """
+    Boxplot statistics in the form matplotlib's Axes.bxp() draws, from 
+    precomputed quartiles: the whiskers reach to the furthest value within 
+    1.5 IQR of the box (bounded by the min and max), and the fliers are 
+    the values of a sample that lie beyond them.
+    """
+    iqr = q3 - q1
+    whislo = max(min_value, q1 - 1.5 * iqr)
+    whishi = min(max_value, q3 + 1.5 * iqr)
+    sample = np.asarray(sample, dtype=float)
+    return dict(med=med, q1=q1, q3=q3, whislo=whislo, whishi=whishi, mean=mean,
+                fliers=sample[(sample < whislo) | (sample > whishi)])
+
+
+def histogram_table_vals(keys, histograms, interval_secs):
+    """
+    Returns the summary, interval table and graph data for a timer, given 
+    the interval keys and a LatencyHistogram of the values in each interval.
+    """
+    # the columns of all of the intervals at once
+    counts = np.array([hist.count for hist in histograms], dtype=float)
+    m2s = np.array([hist.m2 for hist in histograms])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stdevs = np.where(counts >= 2, np.sqrt(m2s / (counts - 1)), np.nan) # sample standard deviation
+    percentiles = LatencyHistogram.percentiles_of(histograms, PERCENTILES)
+    columns = [('interval', list(keys)),
+               ('count', [hist.count for hist in histograms]),
+               ('rate', (counts / float(interval_secs)).tolist()),
+               ('min', [hist.min for hist in histograms]),
+               ('avg', [hist.mean for hist in histograms]),
+               ('max', [hist.max for hist in histograms]),
+               ('stdev', stdevs.tolist())]
+    columns += [('pct_%s' % p, percentiles[:, j].tolist()) for j, p in enumerate(PERCENTILES)]
+    names = [name for name, column in columns]
+    timer_table = [dict(zip(names, row)) for row in zip(*[column for name, column in columns])]
+
+    # graph data
+    graphs = dict(('pct_%s_resptime' % p, dict(zip(keys, percentiles[:, PERCENTILES.index(p)].tolist())))
+                  for p in (50, 80, 95))
+
+    return histogram_stats(LatencyHistogram.merged(histograms)), timer_table, graphs
+
+
+def is_multiple(secs, base_secs):
+    """whether secs is a whole number (1 or more) of base_secs"""
+    factor = secs / float(base_secs)
+    return factor >= 1 and abs(factor - round(factor)) < 1e-9
+
+
+def compact_value(value):
+    """a float rounded to 6 significant digits for json, or None for nan/inf"""
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    return float('%.6g' % value)
+
+
+def report_data(timer, max_intervals=REPORT_MIN_INTERVALS):
+    """
+    The per-interval stats of a TimerSeries at several resolutions, for the 
+    interactive report: the ts_interval itself, then rolled up to 2, 4, 8... 
+    times as long, until there are at most max_intervals intervals.  Each 
+    level holds one list per REPORT_COLUMNS column.
+    """
+    levels = []
+    factor = 1
+    while True:
+        keys, histograms = timer.rollup(factor)
+        interval_secs = timer.interval_secs * factor
+        timer_table = histogram_table_vals(keys, histograms, interval_secs)[1]
+        levels.append(dict(interval_secs=interval_secs,
+                           columns=dict((name, [compact_value(row[name]) for row in timer_table])
+                                        for name in REPORT_COLUMNS)))
+        if len(keys) <= max_intervals:
+            return levels
+        factor *= 2
+
+
+def load_results(results_dir, results_file, run_time, ts_interval, user_group_configs=[]):
+    """the (checkpointed) Results of a results directory"""
+    # prefer the columnar store when the writer kept one, since it doesn't need parsing
+    store_dir = os.path.join(results_dir, 'results_store')
+    expected_intervals = dict((ug_config.name, ug_config.expected_interval) for ug_config in user_group_configs 
+                              if getattr(ug_config, 'expected_interval', None))
+    checkpoint_file = os.path.join(results_dir, CHECKPOINT_FILE)
+    if os.path.exists(os.path.join(store_dir, 'transactions.bin')):
+        return StoreResults(store_dir, run_time, ts_interval, expected_intervals=expected_intervals, 
+                            checkpoint_file=checkpoint_file)
+    return Results(os.path.join(results_dir, results_file), run_time, ts_interval, expected_intervals=expected_intervals, 
+                   checkpoint_file=checkpoint_file)
+
+
+
+def output_results(results_dir, results_file, run_time, rampup, ts_interval, user_group_configs=[], project_config_data='',
+                   graph_processes=None, graph_max_points=None, report_mode='static', node_summaries=None, analysis=None):
+    """
+    Analyze a results file and write results.html.  With report_mode 
+    'interactive' no graphs are rendered: the interval stats go to 
+    results.json, and the page draws its charts from them in the browser.
+    
+    node_summaries, from a distributed run, are listed as a breakdown of 
+    the results by node (see node_summary()).  The analysis of such a run 
+    can be passed in (a SummaryResults), in place of a results file.
+    
+    The analysis is checkpointed in the results directory, so running 
+    this again (during a run, or with a ts_interval that is a multiple of 
+    the one analyzed before) only reads the results added since.
+    """
+    from jinja2 import Template
+    from jinja2 import Environment, FileSystemLoader
+    if report_mode not in ('static', 'interactive'):
+        raise ValueError('unknown report mode: %s (use static or interactive)' % report_mode)
+    # change this to PackageLoader when we get an installable package
+    env = Environment(loader=FileSystemLoader('lib/templates'))
+    if report_mode == 'interactive':
+        template = env.get_template('results_interactive.html')
+    else:
+        template = env.get_template('results_template.html')
+    template_vars=dict()
+    
+    if analysis is not None:
+        results = analysis
+    else:
+        results = load_results(results_dir, results_file, run_time, ts_interval, user_group_configs)
+    
+    print 'transactions: %i' % results.total_transactions
+    print 'errors: %i' % results.total_errors
+    print ''
+    print 'test start: %s' % results.start_datetime
+    print 'test finish: %s' % results.finish_datetime
+    print ''
+    
+    template_vars['total_transactions']=results.total_transactions
+    template_vars['total_errors']=results.total_errors
+    template_vars['run_time']=run_time
+    template_vars['rampup']=rampup
+    template_vars['test_start']=results.start_datetime
+    template_vars['test_finish']=results.finish_datetime
+    template_vars['timeseries_interval']=ts_interval
+    template_vars['user_group_configs']=user_group_configs
+    template_vars['project_config_data']=project_config_data
+    template_vars['node_summaries']=node_summaries or []
+
+    template_vars['timers']={}
+    template_vars['graph_filenames']={}
+    graph_jobs = []
+    report_timers = {}
+    for timer_string in sorted(results.timers):
+        timer = results.timers[timer_string]
+
+        template_vars['timers'][timer_string]={}
+        template_vars['timers'][timer_string]['s'],template_vars['timers'][timer_string]['table'],graph_data, splat_series=timer.timer_table_vals()
+        if timer_string in results.corrected_timers:
+            corrected_summary, corrected_table = results.corrected_timers[timer_string].timer_table_vals()[:2]
+            corrected_rows = dict((row['interval'], row) for row in corrected_table)
+            template_vars['timers'][timer_string]['corrected_s'] = corrected_summary
+            # [raw row, corrected row] for each interval
+            template_vars['timers'][timer_string]['corrected_table'] = [(row, corrected_rows[row['interval']]) 
+                                                                        for row in template_vars['timers'][timer_string]['table']]
+
+        if report_mode == 'interactive':
+            report_timers[timer_string] = report_data(timer)
+            continue
+
+        template_vars['graph_filenames'][timer_string]={}
+        template_vars['graph_filenames'][timer_string]['resptime']=timer_string+'_response_times_intervals.png'
+        template_vars['graph_filenames'][timer_string]['resptime_all']=timer_string+'_response_times.png'
+        template_vars['graph_filenames'][timer_string]['throughput']=timer_string+'_throughput.png'
+
+        throughput_points=timer.throughput_points(run_time)
+
+        graph_jobs.append(((
+                           (('95%', graph_data['pct_95_resptime'],),
+                            ('80%', graph_data['pct_80_resptime']), 
+                            ('Median',graph_data['pct_50_resptime'])), 
+                           ('All timers', timer.sample_points()),
+                           ('Throughput', throughput_points),
+                           splat_series,
+                           template_vars['graph_filenames'][timer_string]['resptime']), 
+                          dict(timer=timer_string, dir=results_dir, max_points=graph_max_points)))
+
+    if report_mode == 'interactive':
+        report = json.dumps(dict(run_time=run_time, ts_interval=ts_interval, timers=report_timers), 
+                            separators=(',', ':'))
+        with open(os.path.join(results_dir, 'results.json'), 'w') as f:
+            f.write(report)
+        # the page embeds the data too, since browsers won't load a file:// url
+        template_vars['report_json'] = report.replace('</', '<\\/')
+    else:
+        graph.render_graphs(graph_jobs, graph_processes)
+
+
+    with open(os.path.join(results_dir, 'results.html'), 'w') as f:
+        f.write(template.render(**template_vars))
+
+
+def node_summary(node_name, results, run_time):
+    """the breakdown of one node of a distributed run, from its Results"""
+    summary = dict(node=node_name, transactions=results.total_transactions, errors=results.total_errors,
+                   throughput=results.total_transactions / float(run_time))
+    if 'Transactions' in results.timers:
+        summary.update(results.timers['Transactions'].timer_table_vals()[0])
+    for name in ('avg', 'pct_50', 'pct_95', 'max'):
+        summary.setdefault(name, float('nan'))
+    return summary
+
+
+def results_summary(results_dir):
+    """
+    The pre-aggregated results of a finished run, as a json-friendly dict: 
+    the totals, and for each timer the LatencyHistogram (to_dict()) of 
+    every BASE_INTERVAL_SECS interval (or ts_interval, if it isn't a 
+    multiple of that), keyed by the interval start.  Summaries of several 
+    nodes can be merged without their raw rows, and rolled up to the 
+    ts_interval and throughput bins like Results does.
+    """
+    run_time, rampup, ts_interval, report_mode, user_group_configs = \
+        read_saved_config(os.path.join(results_dir, 'config.cfg'))
+    interval_secs = BASE_INTERVAL_SECS if is_multiple(ts_interval, BASE_INTERVAL_SECS) else ts_interval
+    results = load_results(results_dir, 'results.csv', run_time, interval_secs, user_group_configs)
+    timers = {}
+    for timer_string, timer in results.timers.iteritems():
+        timers[timer_string] = dict(origin=timer.origin, 
+                                    intervals=[[key, timer.intervals[key].histogram.to_dict()] 
+                                               for key in sorted(timer.intervals)])
+    return dict(run_time=run_time, ts_interval=ts_interval, interval_secs=interval_secs,
+                transactions=results.total_transactions, errors=results.total_errors,
+                epoch_start=results.epoch_start, epoch_finish=results.epoch_finish, timers=timers)
+
+
+
+class IntervalAccumulator(object):
+    """
+    The values of a timer in one interval: a LatencyHistogram for the 
+    statistics, plus a uniform random sample of at most sample_size 
+    [elapsed, value] points for the graphs.
+    """
+    def __init__(self, sample_size=1000):
+        self.sample_size = sample_size
+        self.histogram = LatencyHistogram()
+        self.sample = np.zeros((0, 2))
+        
+    def add(self, points):
+        """add an array of [elapsed, value] points"""
+        n = len(points)
+        if n == 0:
+            return
+        seen = self.histogram.count
+        self.histogram.add_array(points[:, 1])
+        self.add_sample(seen, points)
+        
+    def merge(self, other):
+        """
+        Add everything another IntervalAccumulator has seen.  The samples 
+        are concatenated, so an accumulator merged from the accumulators of 
+        shorter intervals holds a sample stratified by those intervals.
+        """
+        self.histogram.merge(other.histogram)
+        self.sample = np.concatenate((self.sample, other.sample))
+        self.sample_size = max(self.sample_size, len(self.sample))
+        
+    def add_sample(self, seen, sample):
+        """
+        sample [elapsed, value] points that were added to the histogram 
+        after it had seen values
+        """
+        n = len(sample)
+        if seen + n <= self.sample_size:
+            self.sample = np.concatenate((self.sample, sample))
+        else:
+            # a uniform sample of everything seen so far: draw from the old 
+            # sample and the new points in proportion to their counts
+            from_old = np.random.hypergeometric(seen, n, self.sample_size)
+            old = self.sample[np.random.choice(len(self.sample), from_old, replace=False)]
+            new = sample[np.random.choice(len(sample), self.sample_size - from_old, replace=False)]
+            self.sample = np.concatenate((old, new))
+        
+    def to_state(self):
+        # the histogram's attributes are all plain data, and pickle much 
+        # faster than its json-friendly to_dict()
+        return dict(sample_size=self.sample_size, histogram=dict(self.histogram.__dict__), sample=self.sample)
+    
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(state['sample_size'])
+        acc.histogram.__dict__.update(state['histogram'])
+        acc.sample = state['sample']
+        return acc
+        
+
+
+class TimerSeries(object):
+    """
+    Single-pass accumulator for one timer.  Points are routed into one 
+    IntervalAccumulator per interval_secs (counted from the start of the 
+    run), so memory is bounded by the number of intervals 
+    rather than the number of points.  The summary comes from merging the 
+    interval histograms.
+    
+    Results accumulates at a short base interval, and rolls the series up 
+    to the ts_interval with rolled_up(); the throughput comes from the 
+    counts of the base intervals the same way.  Each base interval keeps a 
+    sample of sample_size points, so that the rolled up intervals hold 
+    about as many as one ts_interval would.
+    """
+    def __init__(self, interval_secs, throughput_secs=5.0, sample_size=1000):
+        self.interval_secs = interval_secs
+        self.throughput_secs = throughput_secs
+        self.sample_size = sample_size
+        self.origin = 0.0  # the run's start, which all processes and nodes share
+        self.intervals = {}  # interval key -> IntervalAccumulator
+        self.throughput = None  # throughput points, kept by rolled_up() from the finer series
+        # the bins the throughput is counted in: throughput_secs, or the intervals if they don't fit those exactly
+        if is_multiple(throughput_secs, interval_secs):
+            self.throughput_bin_secs = throughput_secs
+        else:
+            self.throughput_bin_secs = interval_secs
+        
+    def add(self, points):
+        """add an array of [elapsed, value] points"""
+        points = np.asarray(points, dtype=float)
+        if len(points) == 0:
+            return
+        keys = self.interval_secs * ((points[:, 0] - self.origin) // self.interval_secs)
+        # points come close to time order, which mergesort is quick at
+        order = keys.argsort(kind='mergesort')
+        keys = keys[order]
+        points = points[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        accs = []
+        for key in keys[starts].tolist():
+            if key not in self.intervals:
+                self.intervals[key] = IntervalAccumulator(self.sample_size)
+            accs.append(self.intervals[key])
+        seen = [acc.histogram.count for acc in accs]
+        # the histograms of all of the intervals in one pass, then the samples
+        LatencyHistogram.add_grouped([acc.histogram for acc in accs], np.repeat(np.arange(len(accs)), counts), points[:, 1])
+        if self.sample_size:
+            for acc, acc_seen, bucket in zip(accs, seen, np.split(points, starts[1:])):
+                acc.add_sample(acc_seen, bucket)
+        
+    def timer_table_vals(self):
+        """
+        Returns the summary, interval table, graph data and boxplot stats 
+        of the accumulated intervals.
+        """
+        keys = sorted(self.intervals)
+        histograms = [self.intervals[i].histogram for i in keys]
+        summary, timer_table, graphs = histogram_table_vals(keys, histograms, self.interval_secs)
+        splat_series = []
+        # the table has the other quartiles
+        q3s = LatencyHistogram.percentiles_of(histograms, [75])[:, 0].tolist()
+        for i, hist, row, q3 in zip(keys, histograms, timer_table, q3s):
+            splat_series.append((i, box_stats(row['pct_25'], row['pct_50'], q3, hist.min, hist.max, hist.mean, 
+                                              self.intervals[i].sample[:, 1])))
+        return summary, timer_table, graphs, splat_series
+    
+    def rollup(self, factor):
+        """
+        The interval keys and LatencyHistograms of the timer with 
+        intervals factor times as long, merged from the accumulated ones.
+        """
+        secs = self.interval_secs * factor
+        merged = {}
+        for key in sorted(self.intervals):
+            rolled_key = secs * (key // secs)
+            if rolled_key not in merged:
+                merged[rolled_key] = LatencyHistogram()
+            merged[rolled_key].merge(self.intervals[key].histogram)
+        keys = sorted(merged)
+        return keys, [merged[key] for key in keys]
+    
+    def rolled_up(self, interval_secs):
+        """
+        A copy of the series with intervals of interval_secs, a multiple 
+        of the current ones, merged from the current ones.
+        """
+        series = TimerSeries(interval_secs, self.throughput_secs, self.sample_size)
+        series.origin = self.origin
+        series.throughput = self.throughput_points()
+        series.throughput_bin_secs = self.throughput_bin_secs
+        for key in sorted(self.intervals):
+            rolled_key = interval_secs * (key // interval_secs)
+            if rolled_key not in series.intervals:
+                series.intervals[rolled_key] = IntervalAccumulator(0)
+            series.intervals[rolled_key].merge(self.intervals[key])
+        return series
+    
+    def to_state(self):
+        """the series as plain data, for checkpoints"""
+        return dict(interval_secs=self.interval_secs, throughput_secs=self.throughput_secs, 
+                    sample_size=self.sample_size, origin=self.origin, throughput=self.throughput,
+                    throughput_bin_secs=self.throughput_bin_secs,
+                    intervals=dict((key, acc.to_state()) for key, acc in self.intervals.iteritems()))
+    
+    @classmethod
+    def from_state(cls, state):
+        series = cls(state['interval_secs'], state['throughput_secs'], state['sample_size'])
+        series.origin = state['origin']
+        series.throughput = state['throughput']
+        series.throughput_bin_secs = state['throughput_bin_secs']
+        series.intervals = dict((key, IntervalAccumulator.from_state(acc)) for key, acc in state['intervals'].iteritems())
+        return series
+    
+    def throughput_points(self, run_time=None):
+        """
+        timers per second, keyed by the start of each throughput_bin_secs 
+        bin, rolled up from the interval counts.  with a run_time, every bin 
+        from 0 up to it is there, with 0 where nothing was counted, so a 
+        stall shows in the graph.
+        """
+        if self.throughput is not None:
+            points = dict(self.throughput)
+        elif self.throughput_bin_secs == self.interval_secs:
+            points = dict((key, acc.histogram.count / float(self.interval_secs)) for key, acc in self.intervals.iteritems())
+        else:
+            counts = defaultdict(int)
+            for key, acc in self.intervals.iteritems():
+                counts[self.throughput_secs * (key // self.throughput_secs)] += acc.histogram.count
+            points = dict((key, count / float(self.throughput_secs)) for key, count in counts.iteritems())
+        if run_time is not None:
+            for key in np.arange(0, run_time, self.throughput_bin_secs).tolist():
+                points.setdefault(key, 0.0)
+        return points
+    
+    def sample_points(self):
+        """a bounded sample of [elapsed, value] points, spread over all intervals"""
+        return np.concatenate([self.intervals[i].sample for i in sorted(self.intervals)])
+        
+        
+        
+class Results(object):
+    """
+    Parses results.csv in a single streaming pass, feeding each timer's 
+    points to a TimerSeries in chunks of at most chunk_size points.  The 
+    TimerSeries accumulate in base_secs intervals, and are rolled up to 
+    the ts_interval after parsing (if it isn't a multiple of base_secs, 
+    they accumulate in ts_interval intervals directly).
+    
+    With a checkpoint_file, the parse position and the TimerSeries are 
+    saved after parsing, and restored before it, so only the rows added 
+    since the last time are parsed.  A checkpoint is used when it was made 
+    with the same run_time and expected_intervals, and with a ts_interval 
+    that this ts_interval is a multiple of; the timers are then rolled up 
+    from the checkpointed intervals.
+    """
+    def __init__(self, results_file_name, run_time, ts_interval=5, chunk_size=50000, expected_intervals={}, 
+                 checkpoint_file=None, base_secs=BASE_INTERVAL_SECS):
+        self.results_file_name = results_file_name
+        self.run_time = run_time
+        self.ts_interval = ts_interval
+        # the interval the TimerSeries accumulate in, and the sample each of those 
+        # intervals keeps, so a ts_interval gets about 1000 sample points
+        if is_multiple(ts_interval, base_secs):
+            self.analysis_interval = base_secs
+        else:
+            self.analysis_interval = ts_interval
+        self.sample_size = max(1, int(round(1000.0 * self.analysis_interval / ts_interval)))
+        self.position = None  # where parse() got to, see parse()
+        self.chunk_size = chunk_size
+        # user group name -> expected secs between transactions, for the user 
+        # groups whose "Transactions" timer is corrected for coordinated omission
+        self.expected_intervals = expected_intervals
+        # "Transactions" timer with back-filled samples, if there are any expected_intervals
+        self.corrected_timers = {}
+        self.total_transactions = 0
+        self.total_errors = 0
+        self.uniq_timer_names = set()
+        self.uniq_user_group_names = set()
+        self.timers = {}  # timer name -> TimerSeries, including the "Transactions" timer
+        self.epoch_start = None
+        self.epoch_finish = None
+        
+        if checkpoint_file is not None:
+            self.restore_checkpoint(checkpoint_file)
+        self.parse()
+        if checkpoint_file is not None:
+            self.save_checkpoint(checkpoint_file)
+        if self.analysis_interval != self.ts_interval:
+            for timers in (self.timers, self.corrected_timers):
+                for timer_string in timers:
+                    timers[timer_string] = timers[timer_string].rolled_up(self.ts_interval)
+        
+        self.start_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.epoch_start))
+        self.finish_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.epoch_finish))
+        
+    def add_points(self, timer_string, points):
+        try:
+            timer = self.timers[timer_string]
+        except KeyError:
+            timer = self.timers[timer_string] = TimerSeries(self.analysis_interval, sample_size=self.sample_size)
+        timer.add(points)
+        if timer_string == 'Transactions' and self.expected_intervals:
+            self.add_corrected_points(points)
+            
+    def add_corrected_points(self, points, expected_interval=None):
+        """
+        Add points to the corrected "Transactions" timer: raw points, or with 
+        an expected_interval, the samples back-filled for those points.
+        """
+        if expected_interval is not None:
+            points = backfill_points(points, expected_interval)
+        try:
+            timer = self.corrected_timers['Transactions']
+        except KeyError:
+            timer = self.corrected_timers['Transactions'] = TimerSeries(self.analysis_interval, sample_size=self.sample_size)
+        timer.add(points)
+        
+    def restore_checkpoint(self, checkpoint_file):
+        """pick up the analysis saved by save_checkpoint(), if it can be used"""
+        try:
+            with open(checkpoint_file, 'rb') as f:
+                state = pickle.load(f)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return
+        if (state['version'] != CHECKPOINT_VERSION or 
+                state['source'] != os.path.basename(self.results_file_name) or
+                state['run_time'] != self.run_time or 
+                state['expected_intervals'] != self.expected_intervals or
+                not is_multiple(self.ts_interval, state['analysis_interval'])):
+            return
+        self.analysis_interval = state['analysis_interval']
+        self.position = state['position']
+        self.total_transactions = state['total_transactions']
+        self.total_errors = state['total_errors']
+        self.uniq_timer_names = state['uniq_timer_names']
+        self.uniq_user_group_names = state['uniq_user_group_names']
+        self.epoch_start = state['epoch_start']
+        self.epoch_finish = state['epoch_finish']
+        self.timers = dict((name, TimerSeries.from_state(timer)) for name, timer in state['timers'].iteritems())
+        self.corrected_timers = dict((name, TimerSeries.from_state(timer)) 
+                                     for name, timer in state['corrected_timers'].iteritems())
+        
+    def save_checkpoint(self, checkpoint_file):
+        state = dict(version=CHECKPOINT_VERSION, 
+                     source=os.path.basename(self.results_file_name),
+                     run_time=self.run_time,
+                     expected_intervals=self.expected_intervals,
+                     analysis_interval=self.analysis_interval,
+                     position=self.position,
+                     total_transactions=self.total_transactions,
+                     total_errors=self.total_errors,
+                     uniq_timer_names=self.uniq_timer_names,
+                     uniq_user_group_names=self.uniq_user_group_names,
+                     epoch_start=self.epoch_start,
+                     epoch_finish=self.epoch_finish,
+                     timers=dict((name, timer.to_state()) for name, timer in self.timers.iteritems()),
+                     corrected_timers=dict((name, timer.to_state()) for name, timer in self.corrected_timers.iteritems()))
+        # write it aside first, so a reader never sees half a checkpoint
+        with open(checkpoint_file + '.tmp', 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        os.rename(checkpoint_file + '.tmp', checkpoint_file)
+        
+    def __add_pending(self, pending, pending_corrected):
+        for timer_string, points in pending.iteritems():
+            self.add_points(timer_string, points)
+        for user_group_name, points in pending_corrected.iteritems():
+            self.add_corrected_points(points, self.expected_intervals[user_group_name])
+        pending.clear()
+        pending_corrected.clear()
+        
+    def parse(self):
+        """parse results.csv from byte offset self.position on, up to the last complete line"""
+        pending = defaultdict(list)  # timer name -> [elapsed, value] points not yet added
+        pending_corrected = defaultdict(list)  # user group name -> "Transactions" points to back-fill
+        num_pending = 0
+        position = [self.position or 0]
+        
+        def complete_lines(f):
+            # a line without its newline may still be being written
+            for line in f:
+                if not line.endswith('\n'):
+                    return
+                position[0] += len(line)
+                yield line
+                
+        with open(self.results_file_name, 'rb') as f:
+            f.seek(position[0])
+            for fields in csv.reader(complete_lines(f)):
+                elapsed_time = float(fields[1])
+                epoch_secs = float(fields[2])
+                user_group_name = fields[3]
+                trans_time = float(fields[4])
+                error = fields[5]
+                
+                self.uniq_user_group_names.add(user_group_name)
+                
+                custom_timers = json.loads(fields[6])
+                self.uniq_timer_names.update(custom_timers.keys())
+                
+                if error != '':
+                    self.total_errors += 1
+                self.total_transactions += 1
+                
+                if elapsed_time >= self.run_time:  # drop all times that appear after the last request was sent (incomplete interval)
+                    continue
+                if self.epoch_start is None:
+                    self.epoch_start = epoch_secs
+                self.epoch_finish = epoch_secs
+                
+                # Make the "Transactions" timer just another custom timer
+                custom_timers['Transactions'] = trans_time
+                if user_group_name in self.expected_intervals:
+                    pending_corrected[user_group_name].append((elapsed_time, trans_time))
+                for timer_string, val in custom_timers.iteritems():
+                    # the values in a custom timer can either be:
+                    # (1) a single time delta (assumed to occur at the start of the transaction)
+                    # (2) a list of time deltas (all assumed to occur at the start of the transaction)
+                    # (3) (exact time, time delta) tuples
+                    if not isinstance(val, (list, tuple)):
+                        # case (1) 
+                        val=[(elapsed_time, val)]
+                    elif not val:
+                        continue
+                    elif not isinstance(val[0], (list, tuple)):
+                        # case (2)
+                        val=[(elapsed_time, v) for v in val]
+                    else:
+                        # case (3) -- need to change the exact time to a relative time
+                        val=[(t-self.epoch_start, v) for t,v in val]
+                    # now val is a list of (time since start of run, time delta)
+                    pending[timer_string].extend(val)
+                    num_pending += len(val)
+                
+                if num_pending >= self.chunk_size:
+                    self.__add_pending(pending, pending_corrected)
+                    num_pending = 0
+                    
+        self.__add_pending(pending, pending_corrected)
+        self.position = position[0]
+   
+
+
+class StoreResults(Results):
+    """Results read in chunks from a memory-mapped ResultsStore instead of results.csv"""
+    def __init__(self, store_dir, run_time, ts_interval=5, chunk_size=50000, expected_intervals={}, checkpoint_file=None):
+        self.store = ResultsStore(store_dir)
+        Results.__init__(self, store_dir, run_time, ts_interval, chunk_size, expected_intervals, checkpoint_file)
+        
+    def parse(self):
+        """
+        parse the store from self.position on: a dict of the number of 
+        transactions, and of the values of each timer, already parsed
+        """
+        position = self.position or dict(transactions=0, timers={})
+        transactions = self.store.transactions()[position['transactions']:]
+        position['transactions'] += len(transactions)
+        self.total_transactions += len(transactions)
+        self.total_errors += int(np.count_nonzero(transactions['error']))
+        self.uniq_timer_names.update(self.store.timer_names())
+        self.uniq_user_group_names.update(self.store.user_group_name(i) for i in np.unique(transactions['user_group']))
+        
+        # drop all times that appear after the last request was sent (incomplete interval)
+        transactions = transactions[transactions['elapsed'] < self.run_time]
+        if len(transactions):
+            if self.epoch_start is None:
+                self.epoch_start = transactions['epoch'][0]
+            self.epoch_finish = transactions['epoch'][-1]
+        for start in xrange(0, len(transactions), self.chunk_size):
+            chunk = transactions[start:start + self.chunk_size]
+            self.add_points('Transactions', np.column_stack((chunk['elapsed'], chunk['scriptrun_time'])))
+            for user_group_name, expected_interval in self.expected_intervals.iteritems():
+                if user_group_name in self.uniq_user_group_names:
+                    group = chunk[chunk['user_group'] == self.store.indexes['user_groups'][user_group_name]]
+                    self.add_corrected_points(np.column_stack((group['elapsed'], group['scriptrun_time'])), expected_interval)
+        
+        for timer_string in self.store.timer_names():
+            timer = self.store.timer(timer_string)[position['timers'].get(timer_string, 0):]
+            position['timers'][timer_string] = position['timers'].get(timer_string, 0) + len(timer)
+            for start in xrange(0, len(timer), self.chunk_size):
+                chunk = timer[start:start + self.chunk_size]
+                chunk = chunk[chunk['elapsed'] < self.run_time]
+                # exact-time values need to be changed to a relative time
+                elapsed = np.where(chunk['kind'] == TIMER_TIMED, chunk['epoch'] - self.epoch_start, chunk['elapsed'])
+                self.add_points(timer_string, np.column_stack((elapsed, chunk['value'])))
+        self.position = position
+        
+        
+        
+class SummaryResults(object):
+    """
+    The Results of one or more nodes, merged from their summaries (see 
+    results_summary(), or the summaries lib/resultsstream.py collects) 
+    instead of parsed from their rows.  There are no raw points, so the 
+    graphs have no backdrop.  The interval histograms are merged by 
+    interval key, and rolled up to the ts_interval when it is a multiple 
+    of the summaries' interval_secs.
+    """
+    def __init__(self, summaries, run_time, ts_interval=5):
+        self.run_time = run_time
+        self.ts_interval = ts_interval
+        interval_secs = summaries[0]['interval_secs']
+        self.total_transactions = sum(summary['transactions'] for summary in summaries)
+        self.total_errors = sum(summary['errors'] for summary in summaries)
+        epochs = [summary['epoch_start'] for summary in summaries if summary['epoch_start'] is not None]
+        self.epoch_start = min(epochs) if epochs else None
+        epochs = [summary['epoch_finish'] for summary in summaries if summary['epoch_finish'] is not None]
+        self.epoch_finish = max(epochs) if epochs else None
+        self.uniq_user_group_names = set()
+        for summary in summaries:
+            self.uniq_user_group_names.update(summary.get('user_groups', {}))
+        self.corrected_timers = {}
+        self.timers = {}
+        for summary in summaries:
+            if summary['interval_secs'] != interval_secs:
+                raise ValueError('summaries with different intervals: %s and %s secs' % (interval_secs, summary['interval_secs']))
+            for timer_string, timer_summary in summary['timers'].iteritems():
+                if timer_string not in self.timers:
+                    self.timers[timer_string] = TimerSeries(interval_secs, sample_size=0)
+                    self.timers[timer_string].origin = timer_summary['origin']
+                timer = self.timers[timer_string]
+                timer.origin = min(timer.origin, timer_summary['origin'])
+                for key, hist in timer_summary['intervals']:
+                    # like Results, leave out what comes after the run_time (incomplete interval)
+                    if key >= run_time:
+                        continue
+                    if key not in timer.intervals:
+                        timer.intervals[key] = IntervalAccumulator(0)
+                    timer.intervals[key].histogram.merge(LatencyHistogram.from_dict(hist))
+        self.timers = dict((name, timer) for name, timer in self.timers.iteritems() if timer.intervals)
+        self.uniq_timer_names = set(self.timers) - set(['Transactions'])
+        if interval_secs != ts_interval and is_multiple(ts_interval, interval_secs):
+            for timer_string in self.timers:
+                self.timers[timer_string] = self.timers[timer_string].rolled_up(ts_interval)
+        
+        self.start_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.epoch_start))
+        self.finish_datetime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.epoch_finish))
+        
+        
+        
+def backfill_points(points, expected_interval):
+    """
+    Synthetic samples correcting [elapsed, value] points for coordinated 
+    omission: a value v that took longer than the expected_interval between 
+    transactions hid the transactions that would have started during it, 
+    which would have seen v - expected_interval, v - 2*expected_interval, 
+    ... down to expected_interval (as in HdrHistogram's 
+    recordValueWithExpectedInterval).  The samples get the elapsed time of 
+    the point they were back-filled for.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    missing = np.maximum(np.floor(points[:, 1] / expected_interval).astype(int) - 1, 0)
+    total = missing.sum()
+    if total == 0:
+        return np.zeros((0, 2))
+    # steps counts 1, 2, ... missing[i] for each point i
+    steps = np.arange(total) - np.repeat(np.cumsum(missing) - missing, missing) + 1
+    return np.column_stack((np.repeat(points[:, 0], missing), 
+                            np.repeat(points[:, 1], missing) - steps * expected_interval))
+
+
+class SavedUserGroupConfig(object):
+    """the parts of a user group's config that the report uses"""
+    def __init__(self, name, num_threads, script_file, script_options, expected_interval=None):
+        self.name = name
+        self.num_threads = num_threads
+        self.script_file = script_file
+        self.script_options = script_options
+        self.expected_interval = expected_interval
+        
+        
+        
+def read_saved_config(config_file):
+    """
+    The settings the report needs from a saved config.cfg: (run_time, 
+    rampup, ts_interval, report_mode, user_group_configs)
+    """
+    config = ConfigParser.SafeConfigParser()
+    config.read(config_file)
+    run_time = config.getint('global', 'run_time')
+    rampup = config.getint('global', 'rampup')
+    ts_interval = config.getint('global', 'results_ts_interval')
+    try:
+        report_mode = config.get('global', 'report_mode')
+    except ConfigParser.NoOptionError:
+        report_mode = 'static'
+    user_group_configs = []
+    for section in config.sections():
+        if section == 'global':
+            continue
+        try:
+            script_options = config.get(section, 'script_options')
+        except ConfigParser.NoOptionError:
+            script_options = ''
+        try:
+            expected_interval = config.getfloat(section, 'expected_interval')
+        except ConfigParser.NoOptionError:
+            expected_interval = None
+        user_group_configs.append(SavedUserGroupConfig(section, config.getint(section, 'threads'), 
+                                                       config.get(section, 'script'), script_options, 
+                                                       expected_interval))
+    return run_time, rampup, ts_interval, report_mode, user_group_configs
+    
+    
+    
+def rerender(results_dir, ts_interval=None, report_mode=None):
+    """
+    Write the report of a past run again, from the config.cfg saved in 
+    its results directory, optionally with another ts_interval or 
+    report_mode.  The checkpointed analysis is reused where it can be.
+    """
+    run_time, rampup, saved_ts_interval, saved_report_mode, user_group_configs = \
+        read_saved_config(os.path.join(results_dir, 'config.cfg'))
+    project_config_data = ''
+    if os.path.exists(os.path.join(results_dir, 'project_config_data.txt')):
+        with open(os.path.join(results_dir, 'project_config_data.txt')) as f:
+            project_config_data = f.read()
+    output_results(results_dir, 'results.csv', run_time, rampup, ts_interval or saved_ts_interval, user_group_configs, 
+                   project_config_data, report_mode=report_mode or saved_report_mode)
+    
+    
+    
+if __name__ == '__main__':
+    # run from the multi-mechanize directory, which holds the report templates
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        sys.stderr.write('usage: python lib/results.py <results dir> [ts interval] [static|interactive]\n')
+        sys.exit(1)
+    rerender(os.path.join(sys.argv[1], ''),
+             int(sys.argv[2]) if len(sys.argv) > 2 else None,
+             sys.argv[3] if len(sys.argv) > 3 else None)
@@ -1,181 +1,483 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Brian Knox (taotetek@gmail.com)
-#  License: GNU LGPLv3
-#  
-#  This file is part of Multi-Mechanize
-#
-"""a collection of functions and classes for multi-mechanize results files"""
-
-import re
-import fileinput
-from datetime import datetime
-
-try:
-    from sqlalchemy.ext.declarative import declarative_base
-    from sqlalchemy.orm import sessionmaker, relation
-    from sqlalchemy import create_engine
-    from sqlalchemy import Column, Integer, String, Float, DateTime
-    from sqlalchemy import ForeignKey, UniqueConstraint
-except ImportError:
-    print "(optional: please install sqlalchemy to enable db logging)"
-
-
-Base = declarative_base()
-
-class GlobalConfig(Base):
-    """class representing a muli-mechanize global config"""
-    __tablename__ = 'mechanize_global_configs'
-
-    id = Column(Integer, nullable=False, primary_key=True)
-    run_time = Column(Integer, nullable=False)
-    rampup = Column(Integer, nullable=False)
-    results_ts_interval = Column(Integer, nullable=False)
-    user_group_configs = relation("UserGroupConfig",
-        primaryjoin="UserGroupConfig.mechanize_global_configs_id==GlobalConfig.id")
-    results = relation("ResultRow",
-        primaryjoin="GlobalConfig.id==ResultRow.mechanize_global_configs_id")
-
-    def __init__(self, run_time=None, rampup=None, results_ts_interval=None):
-        self.run_time = str(run_time)
-        self.rampup = int(rampup)
-        """rampup time for the rest run"""
-        self.results_ts_interval = int(results_ts_interval)
-
-    def __repr__(self):
-        return "<GlobalConfig('%i', '%i', '%i')>" % (
-                self.run_time, self.rampup, self.results_ts_interval)
-
-class UserGroupConfig(Base):
-    """class representing a multi-mechanize user group config"""
-    __tablename__ = 'mechanize_user_group_configs'
-
-    id = Column (Integer, nullable=False, primary_key=True)
-    mechanize_global_configs_id = Column(Integer, ForeignKey('mechanize_global_configs.id'), nullable=False)
-    user_group = Column(String(50), nullable=False)
-    threads = Column(Integer, nullable=False)
-    script = Column(String(50), nullable=False)
-    script_options = Column(String(50), nullable=False)
-
-    def __init__(self, user_group=None, threads=None, script=None, script_options=None):
-        self.user_group = str(user_group)
-        self.threads = int(threads)
-        self.script = str(script)
-        self.script_options = str(script_options)
-
-    def __repr__(self):
-        return "<UserGroupConfig('%s','%s','%s')>" % (
-                self.user_group, self.threads, self.script)
-
-class ResultRow(Base):
-    """class representing a multi-mechanize results.csv row"""
-    __tablename__ = 'mechanize_results'
-    __table_args__ = (
-        UniqueConstraint('run_id','trans_count', name='uix_1')
-        )
-
-    id = Column(Integer, nullable=False, primary_key=True)
-    mechanize_global_configs_id = Column(Integer, 
-        ForeignKey('mechanize_global_configs.id'), nullable=False)
-    project_name = Column(String(50), nullable=False, index=True)
-    run_id = Column(DateTime, nullable=False, index=True)
-    trans_count = Column(Integer, nullable=False, index=True)
-    elapsed = Column(Float, nullable=False, index=True)
-    epoch = Column(Float, nullable=False, index=True)
-    user_group_name = Column(String(50), nullable=False)
-    scriptrun_time = Column(Float, nullable=False)
-    error = Column(String(255))
-    custom_timers = Column(String(50))
-
-    global_config = relation("GlobalConfig",
-            primaryjoin="ResultRow.mechanize_global_configs_id==GlobalConfig.id")
-
-    timers = relation("TimerRow",
-        primaryjoin="ResultRow.id==TimerRow.mechanize_results_id")
-
-    def __init__(self, project_name=None, run_id=None, trans_count=None, 
-            elapsed=None, epoch=None, user_group_name=None,
-            scriptrun_time=None, error=None, custom_timers=None):
-        self.project_name = str(project_name)
-        self.run_id = run_id
-        self.trans_count = int(trans_count)
-        self.elapsed = float(elapsed)
-        self.epoch = int(epoch)
-        self.user_group_name = str(user_group_name)
-        self.scriptrun_time = float(scriptrun_time)
-        self.error = str(error)
-        self.custom_timers = str(custom_timers)
-
-    def __repr__(self):
-        return "<ResultRow('%s','%s','%i','%.3f','%i','%s','%.3f','%s','%s')>" % (
-                self.project_name, self.run_id, self.trans_count, self.elapsed, 
-                self.epoch, self.user_group_name, self.scriptrun_time, 
-                self.error, self.custom_timers)
- 
-class TimerRow(Base):
-    """class representing a multi-mechanize custom timer result"""
-    __tablename__ = 'mechanize_custom_timers'
-    id = Column(Integer, nullable=False, primary_key=True)
-    mechanize_results_id = Column(Integer, 
-         ForeignKey('mechanize_results.id'), nullable=False)
-    timer_name = Column(String(50), nullable=False, index=True)
-    elapsed = Column(Float, nullable=False, index=True)
-
-    def __init__(self, timer_name=None, elapsed=None):
-        self.timer_name = str(timer_name)
-        self.elapsed = int(elapsed)
-
-    def __repr__(self):
-        return "<TimerRow('%s', '%s')>" % (self.timer_name, self.elapsed)
-
-    result_rows = relation("ResultRow",
-        primaryjoin="TimerRow.mechanize_results_id==ResultRow.id")
-
-def load_results_database(project_name, run_localtime, results_dir, 
-        results_database, run_time, rampup, results_ts_interval,
-        user_group_configs):
-    """parse and load a multi-mechanize results csv file into a database"""
-
-    logline_re = re.compile('(.+),(.+),(.+),(.+),(.+),(.?),(\{.+\})')
-    
-    engine = create_engine(results_database, echo=False)
-    ResultRow.metadata.create_all(engine)
-    TimerRow.metadata.create_all(engine)
-    GlobalConfig.metadata.create_all(engine)
-    UserGroupConfig.metadata.create_all(engine)
-
-    sa_session = sessionmaker(bind=engine)
-    sa_current_session = sa_session()
-    
-    run_id = datetime(run_localtime.tm_year, run_localtime.tm_mon,
-        run_localtime.tm_mday, run_localtime.tm_hour, run_localtime.tm_min,
-        run_localtime.tm_sec)
-
-    results_file = results_dir + 'results.csv'
-   
-    global_config = GlobalConfig(run_time, rampup, results_ts_interval)
-    sa_current_session.add(global_config)
-    
-    for i, ug_config in enumerate(user_group_configs):
-        user_group_config = UserGroupConfig(ug_config.name, 
-                ug_config.num_threads, ug_config.script_file, ug_config.script_options)
-        global_config.user_group_configs.append(user_group_config)
-
-    for line in fileinput.input([results_file]):
-        line = line.rstrip()
-        match = logline_re.match(line)
-        if match:
-            result_row = ResultRow(project_name, run_id, match.group(1), 
-                    match.group(2), match.group(3), match.group(4),
-                    match.group(5), match.group(6), match.group(7))
-    
-            global_config.results.append(result_row)
-            timer_data = eval(match.group(7))
-            for index in timer_data:
-                timer_row = TimerRow(index, timer_data[index])
-                result_row.timers.append(timer_row)
-
-            sa_current_session.add(result_row)
-    
-    sa_current_session.commit()
-    sa_current_session.close()
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Brian Knox (taotetek@gmail.com)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
+#
+"""a collection of functions and classes for multi-mechanize results files"""
+
+import csv
+import Queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from histogram import LatencyHistogram
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+try:
+    from sqlalchemy.ext.declarative import declarative_base
+    from sqlalchemy.orm import sessionmaker, relation
+    from sqlalchemy import create_engine, select, and_
+    from sqlalchemy import Column, Integer, String, Float, DateTime
+    from sqlalchemy import ForeignKey, UniqueConstraint, Index
+except ImportError:
+    print "(optional: please install sqlalchemy to enable db logging)"
+
+
+Base = declarative_base()
+
+class GlobalConfig(Base):
+    """class representing a muli-mechanize global config"""
+    __tablename__ = 'mechanize_global_configs'
+
+    id = Column(Integer, nullable=False, primary_key=True)
+    run_time = Column(Integer, nullable=False)
+    rampup = Column(Integer, nullable=False)
+    results_ts_interval = Column(Integer, nullable=False)
+    user_group_configs = relation("UserGroupConfig",
+        primaryjoin="UserGroupConfig.mechanize_global_configs_id==GlobalConfig.id")
+    results = relation("ResultRow",
+        primaryjoin="GlobalConfig.id==ResultRow.mechanize_global_configs_id")
+
+    def __init__(self, run_time=None, rampup=None, results_ts_interval=None):
+        self.run_time = str(run_time)
+        self.rampup = int(rampup)
+        """rampup time for the rest run"""
+        self.results_ts_interval = int(results_ts_interval)
+
+    def __repr__(self):
+        return "<GlobalConfig('%i', '%i', '%i')>" % (
+                self.run_time, self.rampup, self.results_ts_interval)
+
+class UserGroupConfig(Base):
+    """class representing a multi-mechanize user group config"""
+    __tablename__ = 'mechanize_user_group_configs'
+
+    id = Column (Integer, nullable=False, primary_key=True)
+    mechanize_global_configs_id = Column(Integer, ForeignKey('mechanize_global_configs.id'), nullable=False)
+    user_group = Column(String(50), nullable=False)
+    threads = Column(Integer, nullable=False)
+    script = Column(String(50), nullable=False)
+    script_options = Column(String(50), nullable=False)
+
+    def __init__(self, user_group=None, threads=None, script=None, script_options=None):
+        self.user_group = str(user_group)
+        self.threads = int(threads)
+        self.script = str(script)
+        self.script_options = str(script_options)
+
+    def __repr__(self):
+        return "<UserGroupConfig('%s','%s','%s')>" % (
+                self.user_group, self.threads, self.script)
+
+class ResultRow(Base):
+    """class representing a multi-mechanize results.csv row"""
+    __tablename__ = 'mechanize_results'
+    __table_args__ = (
+        # the nodes of a distributed run share its run_id
+        UniqueConstraint('project_name', 'run_id', 'node_name', 'trans_count', name='uix_1'),
+        )
+
+    id = Column(Integer, nullable=False, primary_key=True)
+    mechanize_global_configs_id = Column(Integer, 
+        ForeignKey('mechanize_global_configs.id'), nullable=False)
+    project_name = Column(String(50), nullable=False, index=True)
+    run_id = Column(DateTime, nullable=False, index=True)
+    node_name = Column(String(100), nullable=False, default='')
+    trans_count = Column(Integer, nullable=False, index=True)
+    elapsed = Column(Float, nullable=False, index=True)
+    epoch = Column(Float, nullable=False, index=True)
+    user_group_name = Column(String(50), nullable=False)
+    scriptrun_time = Column(Float, nullable=False)
+    error = Column(String(255))
+    custom_timers = Column(String(50))
+
+    global_config = relation("GlobalConfig",
+            primaryjoin="ResultRow.mechanize_global_configs_id==GlobalConfig.id")
+
+    timers = relation("TimerRow",
+        primaryjoin="ResultRow.id==TimerRow.mechanize_results_id")
+
+    def __init__(self, project_name=None, run_id=None, trans_count=None, 
+            elapsed=None, epoch=None, user_group_name=None,
+            scriptrun_time=None, error=None, custom_timers=None, node_name=''):
+        self.project_name = str(project_name)
+        self.run_id = run_id
+        self.node_name = str(node_name)
+        self.trans_count = int(trans_count)
+        self.elapsed = float(elapsed)
+        self.epoch = float(epoch)
+        self.user_group_name = str(user_group_name)
+        self.scriptrun_time = float(scriptrun_time)
+        self.error = str(error)
+        self.custom_timers = str(custom_timers)
+
+    def __repr__(self):
+        return "<ResultRow('%s','%s','%i','%.3f','%.6f','%s','%.3f','%s','%s')>" % (
+                self.project_name, self.run_id, self.trans_count, self.elapsed, 
+                self.epoch, self.user_group_name, self.scriptrun_time, 
+                self.error, self.custom_timers)
+ 
+class TimerRow(Base):
+    """class representing a multi-mechanize custom timer result"""
+    __tablename__ = 'mechanize_custom_timers'
+    id = Column(Integer, nullable=False, primary_key=True)
+    mechanize_results_id = Column(Integer, 
+         ForeignKey('mechanize_results.id'), nullable=False)
+    timer_name = Column(String(50), nullable=False, index=True)
+    elapsed = Column(Float, nullable=False, index=True)
+
+    def __init__(self, timer_name=None, elapsed=None):
+        self.timer_name = str(timer_name)
+        self.elapsed = int(elapsed)
+
+    def __repr__(self):
+        return "<TimerRow('%s', '%s')>" % (self.timer_name, self.elapsed)
+
+    result_rows = relation("ResultRow",
+        primaryjoin="TimerRow.mechanize_results_id==ResultRow.id")
+
+class RunSummary(Base):
+    """class representing the summary of one timer over a whole run"""
+    __tablename__ = 'mechanize_run_summaries'
+    __table_args__ = (
+        Index('ix_run_summaries_trend', 'project_name', 'timer_name', 'run_id'),
+        )
+
+    id = Column(Integer, nullable=False, primary_key=True)
+    mechanize_global_configs_id = Column(Integer,
+        ForeignKey('mechanize_global_configs.id'), nullable=False)
+    project_name = Column(String(50), nullable=False)
+    run_id = Column(DateTime, nullable=False, index=True)
+    node_name = Column(String(100), nullable=False, default='')
+    timer_name = Column(String(50), nullable=False)
+    count = Column(Integer, nullable=False)
+    errors = Column(Integer, nullable=False)
+    throughput = Column(Float, nullable=False)
+    min = Column(Float)
+    avg = Column(Float)
+    stdev = Column(Float)
+    p50 = Column(Float)
+    p90 = Column(Float)
+    p95 = Column(Float)
+    p99 = Column(Float)
+    max = Column(Float)
+
+    def __repr__(self):
+        return "<RunSummary('%s','%s','%s','%i')>" % (
+                self.project_name, self.run_id, self.timer_name, self.count)
+
+class IntervalSummary(Base):
+    """class representing the summary of one timer over one results_ts_interval of a run"""
+    __tablename__ = 'mechanize_interval_summaries'
+    __table_args__ = (
+        Index('ix_interval_summaries_run', 'project_name', 'run_id', 'timer_name', 'interval'),
+        )
+
+    id = Column(Integer, nullable=False, primary_key=True)
+    mechanize_global_configs_id = Column(Integer,
+        ForeignKey('mechanize_global_configs.id'), nullable=False)
+    project_name = Column(String(50), nullable=False)
+    run_id = Column(DateTime, nullable=False)
+    node_name = Column(String(100), nullable=False, default='')
+    timer_name = Column(String(50), nullable=False)
+    interval = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    errors = Column(Integer, nullable=False)
+    throughput = Column(Float, nullable=False)
+    min = Column(Float)
+    avg = Column(Float)
+    stdev = Column(Float)
+    p50 = Column(Float)
+    p90 = Column(Float)
+    p95 = Column(Float)
+    p99 = Column(Float)
+    max = Column(Float)
+
+    def __repr__(self):
+        return "<IntervalSummary('%s','%s','%s','%.3f','%i')>" % (
+                self.project_name, self.run_id, self.timer_name, self.interval, self.count)
+
+def load_results_database(project_name, run_localtime, results_dir, 
+        results_database, run_time, rampup, results_ts_interval,
+        user_group_configs, chunk_size=10000, node_name=''):
+    """
+    parse and load a multi-mechanize results csv file into a database.
+
+    the csv is streamed in chunks of chunk_size rows, each inserted with
+    bulk (executemany) inserts and committed, so memory use doesn't grow
+    with the size of the results.  the nodes of a distributed run share
+    its run_id, and are told apart by their node_name.
+    """
+    engine = create_engine(results_database, echo=False)
+    Base.metadata.create_all(engine)
+    
+    run_id = _run_id(run_localtime)
+    results_file = results_dir + 'results.csv'
+    global_config_id = _load_configs(engine, run_time, rampup, results_ts_interval,
+        user_group_configs)
+    summarizer = RunSummarizer(run_time, results_ts_interval)
+
+    loaded = 0
+    with open(results_file, 'rb') as f:
+        chunk = []
+        for fields in csv.reader(f):
+            chunk.append((int(fields[0]), float(fields[1]), float(fields[2]), fields[3],
+                float(fields[4]), fields[5], json.loads(fields[6])))
+            if len(chunk) >= chunk_size:
+                loaded += _load_chunk(engine, chunk, project_name, run_id, node_name, global_config_id)
+                summarizer.add(chunk)
+                chunk = []
+                sys.stdout.write('  %i results loaded\r' % loaded)
+                sys.stdout.flush()
+        loaded += _load_chunk(engine, chunk, project_name, run_id, node_name, global_config_id)
+        summarizer.add(chunk)
+    print '  %i results loaded' % loaded
+    summarizer.load(engine, project_name, run_id, node_name, global_config_id)
+
+
+
+class DatabaseSink(threading.Thread):
+    """
+    loads results into a database while the test is running.
+
+    rows handed to add() are collected and bulk inserted (like
+    load_results_database() does) once flush_rows of them are waiting or
+    flush_secs after the first one arrived.  at most max_backlog add()
+    calls can be waiting for the database; after that add() blocks, so a
+    slow database holds back the results writer rather than filling memory.
+    """
+    def __init__(self, project_name, run_localtime, results_database,
+            run_time, rampup, results_ts_interval, user_group_configs,
+            flush_rows=10000, flush_secs=1.0, max_backlog=50, node_name=''):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.project_name = project_name
+        self.node_name = node_name
+        self.flush_rows = flush_rows
+        self.flush_secs = flush_secs
+        self.queue = Queue.Queue(max_backlog)
+        self.loaded = 0
+        self.failed = False
+        self.engine = create_engine(results_database, echo=False)
+        Base.metadata.create_all(self.engine)
+        self.run_id = _run_id(run_localtime)
+        self.global_config_id = _load_configs(self.engine, run_time, rampup,
+            results_ts_interval, user_group_configs)
+        self.summarizer = RunSummarizer(run_time, results_ts_interval)
+
+    def add(self, rows):
+        """
+        queue (trans_count, elapsed, epoch, user_group_name, scriptrun_time,
+        error, custom_timers) rows for loading
+        """
+        if rows and not self.failed:
+            self.queue.put(rows)
+
+    def backlog(self):
+        """number of add() calls waiting for the database"""
+        return self.queue.qsize()
+
+    def close(self):
+        """load whatever is still waiting, and wait for it"""
+        self.queue.put(None)
+        self.join()
+
+    def run(self):
+        chunk = []
+        deadline = None
+        finished = False
+        while not finished:
+            try:
+                if deadline is None:
+                    rows = self.queue.get()
+                else:
+                    rows = self.queue.get(timeout=max(deadline - time.time(), 0))
+                if rows is None:
+                    finished = True
+                else:
+                    chunk.extend(rows)
+                    if deadline is None:
+                        deadline = time.time() + self.flush_secs
+                    if len(chunk) < self.flush_rows:
+                        continue
+            except Queue.Empty:
+                pass
+            try:
+                self.loaded += _load_chunk(self.engine, chunk, self.project_name,
+                    self.run_id, self.node_name, self.global_config_id)
+                self.summarizer.add(chunk)
+                if finished:
+                    self.summarizer.load(self.engine, self.project_name,
+                        self.run_id, self.node_name, self.global_config_id)
+            except Exception, e:
+                # keep the test running; results.csv still has everything
+                sys.stderr.write('ERROR: loading results into database failed: %s\n' % e)
+                self.failed = True
+                if not finished:
+                    self.__discard()
+                return
+            chunk = []
+            deadline = None
+
+    def __discard(self):
+        # unblock the writer, and let close() return
+        while True:
+            if self.queue.get() is None:
+                return
+
+
+
+class RunSummarizer(object):
+    """
+    accumulates results rows into a LatencyHistogram per timer for the
+    whole run and for every results_ts_interval (counted from the start
+    of the run), to fill the summary tables once the rows are loaded.
+    like the report (lib/results.py), the timers leave out the rows that
+    finished after the run_time, and the error total counts all rows.
+    """
+    def __init__(self, run_time, results_ts_interval):
+        self.run_time = run_time
+        self.interval_secs = results_ts_interval
+        self.histograms = {}  # timer name -> {interval start: LatencyHistogram}
+        self.errors = {}  # interval start -> error count
+        self.total_errors = 0
+
+    def add(self, rows):
+        timer_values = {}  # (timer name, interval start) -> values
+        for trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, custom_timers in rows:
+            if error != '':
+                self.total_errors += 1
+            # the last, incomplete interval
+            if elapsed >= self.run_time:
+                continue
+            interval = self.interval_secs * (elapsed // self.interval_secs)
+            if error != '':
+                self.errors[interval] = self.errors.get(interval, 0) + 1
+            timer_values.setdefault(('Transactions', interval), []).append(scriptrun_time)
+            for timer_name, val in custom_timers.iteritems():
+                values = timer_values.setdefault((timer_name, interval), [])
+                if not isinstance(val, (list, tuple)):
+                    values.append(val)
+                elif val and isinstance(val[0], (list, tuple)):
+                    values.extend(v for t, v in val)
+                else:
+                    values.extend(val)
+        for (timer_name, interval), values in timer_values.iteritems():
+            intervals = self.histograms.setdefault(timer_name, {})
+            if interval not in intervals:
+                intervals[interval] = LatencyHistogram()
+            intervals[interval].add_array(values)
+
+    def __summary(self, hist, secs):
+        p50, p90, p95, p99 = hist.percentiles([50, 90, 95, 99])
+        return dict(count=hist.count, throughput=hist.count / float(secs),
+                    min=hist.min, avg=hist.mean, stdev=hist.stdev(), p50=p50, p90=p90,
+                    p95=p95, p99=p99, max=hist.max)
+
+    def load(self, engine, project_name, run_id, node_name, global_config_id):
+        """insert (and commit) the run and interval summaries"""
+        run_rows = []
+        interval_rows = []
+        for timer_name, intervals in self.histograms.iteritems():
+            run_hist = LatencyHistogram()
+            for interval, hist in sorted(intervals.iteritems()):
+                run_hist.merge(hist)
+                row = self.__summary(hist, self.interval_secs)
+                row.update(mechanize_global_configs_id=global_config_id, project_name=str(project_name),
+                           run_id=run_id, node_name=node_name, timer_name=timer_name, interval=interval,
+                           errors=self.errors.get(interval, 0) if timer_name == 'Transactions' else 0)
+                interval_rows.append(row)
+            row = self.__summary(run_hist, self.run_time)
+            row.update(mechanize_global_configs_id=global_config_id, project_name=str(project_name),
+                       run_id=run_id, node_name=node_name, timer_name=timer_name,
+                       errors=self.total_errors if timer_name == 'Transactions' else 0)
+            run_rows.append(row)
+        # nan (the stdev of a single value) doesn't survive every database
+        for row in run_rows + interval_rows:
+            if row['stdev'] != row['stdev']:
+                row['stdev'] = None
+        with engine.begin() as connection:
+            if run_rows:
+                connection.execute(RunSummary.__table__.insert(), run_rows)
+            if interval_rows:
+                connection.execute(IntervalSummary.__table__.insert(), interval_rows)
+
+
+
+def _run_id(run_localtime):
+    return datetime(run_localtime.tm_year, run_localtime.tm_mon,
+        run_localtime.tm_mday, run_localtime.tm_hour, run_localtime.tm_min,
+        run_localtime.tm_sec)
+
+
+
+def _load_configs(engine, run_time, rampup, results_ts_interval, user_group_configs):
+    """insert the global and user group configs of a run, returns the global config id"""
+    sa_session = sessionmaker(bind=engine)
+    sa_current_session = sa_session()
+    
+    global_config = GlobalConfig(run_time, rampup, results_ts_interval)
+    sa_current_session.add(global_config)
+    
+    for ug_config in user_group_configs:
+        user_group_config = UserGroupConfig(ug_config.name, 
+                ug_config.num_threads, ug_config.script_file, ug_config.script_options)
+        global_config.user_group_configs.append(user_group_config)
+
+    # the configs are few, the orm is fine for them
+    sa_current_session.commit()
+    global_config_id = global_config.id
+    sa_current_session.close()
+    return global_config_id
+
+
+
+def _load_chunk(engine, chunk, project_name, run_id, node_name, global_config_id):
+    """
+    bulk insert (and commit) a chunk of (trans_count, elapsed, epoch,
+    user_group_name, scriptrun_time, error, custom_timers) rows and their timers
+    """
+    if not chunk:
+        return 0
+    results_table = ResultRow.__table__
+    timers_table = TimerRow.__table__
+    result_rows = []
+    timer_data = {}  # trans_count -> custom timers
+    for trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, custom_timers in chunk:
+        result_rows.append(dict(mechanize_global_configs_id=global_config_id,
+            project_name=str(project_name), run_id=run_id, node_name=node_name, trans_count=trans_count,
+            elapsed=elapsed, epoch=epoch, user_group_name=user_group_name,
+            scriptrun_time=scriptrun_time, error=error, custom_timers=json.dumps(custom_timers)))
+        timer_data[trans_count] = custom_timers
+
+    with engine.begin() as connection:
+        connection.execute(results_table.insert(), result_rows)
+        # executemany doesn't hand back the new ids, so look them up by the 
+        # (project_name, run_id, node_name, trans_count) unique index
+        first, last = min(timer_data), max(timer_data)
+        ids = connection.execute(select([results_table.c.id, results_table.c.trans_count]).where(
+            and_(results_table.c.project_name == str(project_name), results_table.c.run_id == run_id,
+                 results_table.c.node_name == node_name, results_table.c.trans_count.between(first, last))))
+        timer_rows = []
+        for result_id, trans_count in ids:
+            for timer_name, val in timer_data.get(trans_count, {}).iteritems():
+                # the values in a custom timer can be a single time delta, a list 
+                # of time deltas, or (exact time, time delta) tuples
+                if not isinstance(val, (list, tuple)):
+                    val = [val]
+                elif val and isinstance(val[0], (list, tuple)):
+                    val = [v for t, v in val]
+                for v in val:
+                    timer_rows.append(dict(mechanize_results_id=result_id, 
+                        timer_name=timer_name, elapsed=float(v)))
+        if timer_rows:
+            connection.execute(timers_table.insert(), timer_rows)
+    return len(result_rows)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Brian Knox (taotetek@gmail.com)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""
+trend queries across the runs stored in a results database
+
+The queries read the mechanize_run_summaries and
+mechanize_interval_summaries tables filled in by lib/resultsloader.py,
+so they don't depend on the number of raw results rows.  Each node of a
+distributed run has its own summaries under the run's run_id; a
+node_name picks out one node's.
+
+usage:
+    python lib/resultsquery.py <results database> <project name> [timer name] [num runs]
+
+e.g.:
+    python lib/resultsquery.py sqlite:///results.db default_project Transactions 20
+"""
+
+import sys
+
+from sqlalchemy import create_engine, select, desc
+
+from resultsloader import RunSummary, IntervalSummary
+
+
+SUMMARY_COLUMNS = ['count', 'errors', 'throughput', 'min', 'avg', 'stdev', 'p50', 'p90', 'p95', 'p99', 'max']
+
+
+
+class ResultsQuery(object):
+    """queries over the summary tables of one results database"""
+    def __init__(self, results_database):
+        self.engine = create_engine(results_database, echo=False)
+
+    def __rows(self, query):
+        return [dict(row.items()) for row in self.engine.execute(query)]
+
+    def runs(self, project_name, last=None):
+        """the run ids of a project, newest first"""
+        table = RunSummary.__table__
+        query = select([table.c.run_id]).where(table.c.project_name == project_name).distinct() \
+            .order_by(desc(table.c.run_id))
+        if last is not None:
+            query = query.limit(last)
+        return [row[0] for row in self.engine.execute(query)]
+
+    def timer_names(self, project_name, run_id):
+        table = RunSummary.__table__
+        query = select([table.c.timer_name]).where(
+            (table.c.project_name == project_name) & (table.c.run_id == run_id)).distinct().order_by(table.c.timer_name)
+        return [row[0] for row in self.engine.execute(query)]
+
+    def trend(self, project_name, timer_name='Transactions', last=10, node_name=None):
+        """
+        the run summaries (run_id, node_name, count, errors, throughput, min,
+        avg, stdev, p50, p90, p95, p99, max) of a timer over the last runs
+        of a project, oldest first.  a distributed run has one per node,
+        unless a node_name is given.
+        """
+        table = RunSummary.__table__
+        where = (table.c.project_name == project_name) & (table.c.timer_name == timer_name)
+        if node_name is not None:
+            where = where & (table.c.node_name == node_name)
+        run_ids = select([table.c.run_id]).where(where).distinct() \
+            .order_by(desc(table.c.run_id)).limit(last).alias('last_runs')
+        query = select([table.c.run_id, table.c.node_name] + [table.c[name] for name in SUMMARY_COLUMNS]).where(
+            where & table.c.run_id.in_(select([run_ids.c.run_id]))).order_by(table.c.run_id, table.c.node_name)
+        return self.__rows(query)
+
+    def intervals(self, project_name, run_id, timer_name='Transactions', node_name=None):
+        """
+        the interval summaries (interval, node_name, count, errors, ...) of a
+        timer in one run, in time order.  a distributed run has one per node
+        for each interval, unless a node_name is given.
+        """
+        table = IntervalSummary.__table__
+        where = (table.c.project_name == project_name) & (table.c.run_id == run_id) & \
+            (table.c.timer_name == timer_name)
+        if node_name is not None:
+            where = where & (table.c.node_name == node_name)
+        query = select([table.c.interval, table.c.node_name] + [table.c[name] for name in SUMMARY_COLUMNS]).where(where) \
+            .order_by(table.c.interval, table.c.node_name)
+        return self.__rows(query)
+
+
+
+def format_value(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return '%.3f' % value
+    return str(value)
+
+
+
+def main(args):
+    if len(args) < 2 or len(args) > 4:
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+    results_database, project_name = args[:2]
+    timer_name = args[2] if len(args) > 2 else 'Transactions'
+    last = int(args[3]) if len(args) > 3 else 10
+
+    trend = ResultsQuery(results_database).trend(project_name, timer_name, last)
+    columns = ['run_id', 'node_name', 'count', 'errors', 'throughput', 'avg', 'p50', 'p95', 'p99', 'max']
+    print '  '.join('%-19s' % c if c in ('run_id', 'node_name') else '%10s' % c for c in columns)
+    for row in trend:
+        print '  '.join('%-19s' % row[c] if c in ('run_id', 'node_name') else '%10s' % format_value(row[c]) for c in columns)
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""
+columnar, append-only binary store for multi-mechanize results
+
+A store is a directory holding:
+    transactions.bin  -- one TRANSACTION_DTYPE record per transaction
+    timer_<n>.bin     -- one TIMER_DTYPE record per value of custom timer n
+    strings.json      -- interned user group, error and timer name strings
+
+The .bin files are plain arrays of fixed-size records, so they can be
+appended to while a test runs and memory-mapped with numpy for analysis.
+
+usage:
+    python lib/resultsstore.py tostore <results.csv> <store dir>
+    python lib/resultsstore.py tocsv <store dir> <results.csv>
+"""
+
+import csv
+import os
+import sys
+import numpy as np
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+
+TRANSACTION_DTYPE = np.dtype([('trans_count', '<i8'), ('elapsed', '<f8'), ('epoch', '<f8'),
+                              ('user_group', '<i4'), ('scriptrun_time', '<f8'), ('error', '<i4')])
+TIMER_DTYPE = np.dtype([('trans_count', '<i8'), ('elapsed', '<f8'), ('epoch', '<f8'),
+                        ('value', '<f8'), ('kind', 'u1')])
+
+# the values in a custom timer can either be:
+TIMER_VALUE = 0  # a single time delta (epoch is the transaction's epoch)
+TIMER_LIST = 1   # one of a list of time deltas (epoch is the transaction's epoch)
+TIMER_TIMED = 2  # an (exact time, time delta) tuple (epoch is the exact time)
+
+
+
+class ResultsStore(object):
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0755)
+        self.strings_file = os.path.join(self.path, 'strings.json')
+        if os.path.exists(self.strings_file):
+            with open(self.strings_file, 'r') as f:
+                strings = json.load(f)
+        else:
+            strings = {'user_groups': [], 'errors': [''], 'timers': []}
+        # json gives us back unicode, but the rest of multi-mechanize deals in str
+        self.strings = dict((key, [s.encode('utf-8') for s in values]) for key, values in strings.items())
+        self.indexes = dict((key, dict((s, i) for i, s in enumerate(values))) for key, values in self.strings.items())
+        self.strings_changed = False
+
+    def __intern(self, key, s):
+        try:
+            return self.indexes[key][s]
+        except KeyError:
+            self.strings[key].append(s)
+            self.indexes[key][s] = len(self.strings[key]) - 1
+            self.strings_changed = True
+            return self.indexes[key][s]
+
+    def append(self, rows):
+        """
+        Append rows of (trans_count, elapsed, epoch, user_group_name,
+        scriptrun_time, error, custom_timers) to the store.
+        """
+        self.strings_changed = False
+        transactions = []
+        timers = {}
+        for trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, custom_timers in rows:
+            transactions.append((trans_count, elapsed, epoch, self.__intern('user_groups', user_group_name),
+                                 scriptrun_time, self.__intern('errors', error)))
+            for timer_name, val in custom_timers.iteritems():
+                records = timers.setdefault(self.__intern('timers', timer_name), [])
+                if not isinstance(val, (list, tuple)):
+                    records.append((trans_count, elapsed, epoch, val, TIMER_VALUE))
+                elif len(val) == 0:
+                    continue
+                elif not isinstance(val[0], (list, tuple)):
+                    records.extend((trans_count, elapsed, epoch, v, TIMER_LIST) for v in val)
+                else:
+                    records.extend((trans_count, elapsed, t, v, TIMER_TIMED) for t, v in val)
+
+        # strings go first, so the records never refer to an unknown string
+        if self.strings_changed:
+            tmp_file = self.strings_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.strings, f)
+            if os.path.exists(self.strings_file) and sys.platform.startswith('win'):
+                os.remove(self.strings_file)  # rename won't replace a file on windows
+            os.rename(tmp_file, self.strings_file)
+        self.__append_records('transactions.bin', transactions, TRANSACTION_DTYPE)
+        for timer_num, records in timers.iteritems():
+            self.__append_records('timer_%i.bin' % timer_num, records, TIMER_DTYPE)
+
+    def __append_records(self, file_name, records, dtype):
+        if records:
+            with open(os.path.join(self.path, file_name), 'ab') as f:
+                np.array(records, dtype=dtype).tofile(f)
+
+    def __map(self, file_name, dtype):
+        file_name = os.path.join(self.path, file_name)
+        if not os.path.exists(file_name) or os.path.getsize(file_name) < dtype.itemsize:
+            return np.zeros(0, dtype=dtype)  # can't memory-map an empty file
+        return np.memmap(file_name, dtype=dtype, mode='r', shape=(os.path.getsize(file_name) // dtype.itemsize,))
+
+    def transactions(self):
+        """memory-mapped array of TRANSACTION_DTYPE records"""
+        return self.__map('transactions.bin', TRANSACTION_DTYPE)
+
+    def timer_names(self):
+        return list(self.strings['timers'])
+
+    def timer(self, timer_name):
+        """memory-mapped array of TIMER_DTYPE records for a custom timer"""
+        return self.__map('timer_%i.bin' % self.indexes['timers'][timer_name], TIMER_DTYPE)
+
+    def user_group_name(self, index):
+        return self.strings['user_groups'][index]
+
+    def error(self, index):
+        return self.strings['errors'][index]
+
+    def rows(self):
+        """
+        Generate the stored transactions as the same tuples that are
+        given to append().
+        """
+        timers = [(name, self.timer(name)) for name in self.timer_names()]
+        cursors = [0] * len(timers)
+        for trans in self.transactions():
+            trans_count = int(trans['trans_count'])
+            custom_timers = {}
+            for i, (timer_name, records) in enumerate(timers):
+                start = cursors[i]
+                end = start
+                while end < len(records) and records[end]['trans_count'] == trans_count:
+                    end += 1
+                if end == start:
+                    continue
+                cursors[i] = end
+                kind = records[start]['kind']
+                if kind == TIMER_VALUE:
+                    custom_timers[timer_name] = float(records[start]['value'])
+                elif kind == TIMER_LIST:
+                    custom_timers[timer_name] = [float(v) for v in records[start:end]['value']]
+                else:
+                    custom_timers[timer_name] = [(float(t), float(v)) for t, v in 
+                                                 zip(records['epoch'][start:end], records['value'][start:end])]
+            yield (trans_count, float(trans['elapsed']), float(trans['epoch']),
+                   self.user_group_name(trans['user_group']), float(trans['scriptrun_time']),
+                   self.error(trans['error']), custom_timers)
+
+
+
+def csv_to_store(results_file_name, store_path, chunk_size=10000):
+    """convert a results.csv file into a results store"""
+    store = ResultsStore(store_path)
+    rows = []
+    with open(results_file_name, 'rb') as f:
+        for fields in csv.reader(f):
+            rows.append((int(fields[0]), float(fields[1]), float(fields[2]), fields[3],
+                         float(fields[4]), fields[5], json.loads(fields[6])))
+            if len(rows) >= chunk_size:
+                store.append(rows)
+                rows = []
+    store.append(rows)
+    return store
+
+
+
+def store_to_csv(store_path, results_file_name):
+    """convert a results store back into a results.csv file"""
+    store = ResultsStore(store_path)
+    with open(results_file_name, 'wb') as f:
+        writer = csv.writer(f)
+        for trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, custom_timers in store.rows():
+            writer.writerow((trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, json.dumps(custom_timers)))
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] not in ('tostore', 'tocsv'):
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'tostore':
+        csv_to_store(sys.argv[2], sys.argv[3])
+    else:
+        store_to_csv(sys.argv[2], sys.argv[3])
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+#
+"""
+pushing interval summaries of a run from the nodes to a collector
+
+A node's ResultsStreamer keeps one tcp connection to the ResultsCollector
+of the controller, and pushes a line of json every push_secs: the
+LatencyHistograms of the transactions written since the last push, per
+interval (of elapsed time), user group and timer.  Histograms merge, so
+the collector just adds up what it is sent, and ends up with summaries
+of every node that a merged report can be made from (see
+results.SummaryResults) without moving any raw rows.
+"""
+
+import socket
+import SocketServer
+import threading
+import time
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from histogram import LatencyHistogram
+
+
+# the streamed summaries are of intervals of this many secs
+STREAM_INTERVAL_SECS = 1
+
+
+
+def timer_values(val):
+    """the values of a custom timer, as recorded by a script"""
+    if not isinstance(val, (list, tuple)):
+        return [val]
+    elif val and isinstance(val[0], (list, tuple)):
+        return [v for t, v in val]
+    else:
+        return list(val)
+
+
+
+class ResultsStreamer(threading.Thread):
+    """
+    Pushes the summaries of the rows add()ed to it to the collector at
+    host:port, as node_name.  Summaries that can't be sent (the collector
+    is down, or not up yet) are kept and merged into the next push.
+    """
+    def __init__(self, collector, node_name, push_secs=1.0, connect_timeout=5.0):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        host, port = collector.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.node_name = node_name
+        self.push_secs = push_secs
+        self.connect_timeout = connect_timeout
+        self.lock = threading.Lock()
+        self.pending = {}  # (interval, user group name, timer name) -> LatencyHistogram
+        self.pending_errors = {}  # (interval, user group name) -> error count
+        self.transactions = 0
+        self.errors = 0
+        self.epoch_start = None
+        self.epoch_finish = None
+        self.finished = threading.Event()
+        self.sock = None
+        self.pushed = 0  # pushes the collector got
+        self.failed = 0  # pushes that didn't get through (and were kept for the next)
+
+    def add(self, rows):
+        """add a batch of ResultsWriter rows"""
+        values = {}
+        errors = {}
+        for trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, custom_timers in rows:
+            interval = STREAM_INTERVAL_SECS * int(elapsed // STREAM_INTERVAL_SECS)
+            values.setdefault((interval, user_group_name, 'Transactions'), []).append(scriptrun_time)
+            for timer_name, val in custom_timers.iteritems():
+                values.setdefault((interval, user_group_name, timer_name), []).extend(timer_values(val))
+            if error != '':
+                errors[interval, user_group_name] = errors.get((interval, user_group_name), 0) + 1
+        with self.lock:
+            for key, vals in values.iteritems():
+                if key not in self.pending:
+                    self.pending[key] = LatencyHistogram()
+                self.pending[key].add_array(vals)
+            for key, count in errors.iteritems():
+                self.pending_errors[key] = self.pending_errors.get(key, 0) + count
+            self.transactions += len(rows)
+            self.errors += sum(errors.itervalues())
+            if rows:
+                if self.epoch_start is None:
+                    self.epoch_start = rows[0][2]
+                self.epoch_finish = rows[-1][2]
+
+    def run(self):
+        while not self.finished.is_set():
+            self.finished.wait(self.push_secs)
+            self.push(done=self.finished.is_set())
+        if self.sock is not None:
+            self.sock.close()
+
+    def push(self, done=False):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            pending_errors, self.pending_errors = self.pending_errors, {}
+            message = dict(node=self.node_name, done=done,
+                           transactions=self.transactions, errors=self.errors,
+                           epoch_start=self.epoch_start, epoch_finish=self.epoch_finish)
+        message['intervals'] = [dict(interval=interval, user_group=user_group_name, timer=timer_name,
+                                     errors=pending_errors.get((interval, user_group_name), 0) if timer_name == 'Transactions' else 0,
+                                     histogram=hist.to_dict())
+                                for (interval, user_group_name, timer_name), hist in pending.iteritems()]
+        try:
+            if self.sock is None:
+                self.sock = socket.create_connection(self.address, self.connect_timeout)
+            self.sock.sendall(json.dumps(message, separators=(',', ':')) + '\n')
+            self.pushed += 1
+        except socket.error:
+            self.failed += 1
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            # keep them for the next push
+            with self.lock:
+                for key, hist in pending.iteritems():
+                    if key in self.pending:
+                        hist.merge(self.pending[key])
+                    self.pending[key] = hist
+                for key, count in pending_errors.iteritems():
+                    self.pending_errors[key] = self.pending_errors.get(key, 0) + count
+
+    def close(self, timeout=10):
+        """push the rest, telling the collector the node is done"""
+        self.finished.set()
+        self.join(timeout)
+
+
+
+class CollectorServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+
+class ResultsCollector(threading.Thread):
+    """
+    Takes the pushes of any number of ResultsStreamers on port, and merges
+    them per node, timer and interval.
+    """
+    def __init__(self, port, host=''):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.lock = threading.Lock()
+        self.nodes = {}  # node name -> dict of its totals, user groups and timers
+        self.latest = None  # the latest interval any node pushed
+        self.earliest = None  # the earliest interval any node pushed
+        collector = self
+
+        class Handler(SocketServer.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    # a line cut short by a failed send is sent again whole
+                    if line.endswith('\n'):
+                        collector.receive(json.loads(line))
+
+        self.server = CollectorServer((host, port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def receive(self, message):
+        """merge a push of a node"""
+        with self.lock:
+            node = self.nodes.setdefault(message['node'], dict(timers={}, user_groups={}))
+            for name in ('done', 'transactions', 'errors', 'epoch_start', 'epoch_finish'):
+                node[name] = message[name]
+            node['last_push'] = time.time()
+            for entry in message['intervals']:
+                interval = entry['interval']
+                intervals = node['timers'].setdefault(entry['timer'], {})
+                hist = LatencyHistogram.from_dict(entry['histogram'])
+                if interval in intervals:
+                    intervals[interval].merge(hist)
+                else:
+                    intervals[interval] = hist
+                if entry['timer'] == 'Transactions':
+                    user_group = node['user_groups'].setdefault(entry['user_group'], dict(transactions=0, errors=0))
+                    user_group['transactions'] += hist.count
+                    user_group['errors'] += entry['errors']
+                if self.latest is None or interval > self.latest:
+                    self.latest = interval
+                if self.earliest is None or interval < self.earliest:
+                    self.earliest = interval
+
+    def all_done(self, node_names):
+        """whether all of node_names have pushed their last summaries"""
+        with self.lock:
+            return all(self.nodes.get(name, {}).get('done') for name in node_names)
+
+    def snapshot(self, window_secs=10):
+        """
+        the stats merged over all nodes for the last window_secs of complete
+        intervals, and the totals of each node, as a json-friendly dict
+        """
+        merged = {}
+        nodes = {}
+        secs = window_secs
+        with self.lock:
+            if self.latest is not None:
+                # the latest interval is still being filled
+                first = self.latest - window_secs
+                # until there are window_secs of complete intervals, the throughput is over those there are
+                secs = self.latest - max(first, self.earliest)
+                for node_name, node in self.nodes.iteritems():
+                    for timer_name, intervals in node['timers'].iteritems():
+                        for interval, hist in intervals.iteritems():
+                            if first <= interval < self.latest:
+                                if timer_name not in merged:
+                                    merged[timer_name] = LatencyHistogram()
+                                merged[timer_name].merge(hist)
+            for node_name, node in self.nodes.iteritems():
+                nodes[node_name] = dict(transactions=node['transactions'], errors=node['errors'], done=node['done'],
+                                        user_groups=dict((name, dict(ug)) for name, ug in node['user_groups'].iteritems()))
+        timers = {}
+        for timer_name, hist in merged.iteritems():
+            p50, p95, p99 = hist.percentiles([50, 95, 99])
+            timers[timer_name] = dict(count=hist.count, throughput=hist.count / float(secs) if secs > 0 else 0.0,
+                                      avg=hist.mean, p50=p50, p95=p95, p99=p99, max=hist.max)
+        return dict(window_secs=window_secs,
+                    transactions=sum(node['transactions'] for node in nodes.itervalues()),
+                    errors=sum(node['errors'] for node in nodes.itervalues()),
+                    timers=timers, nodes=nodes)
+
+    def summaries(self):
+        """node name -> the node's summary, in the form of results.results_summary()"""
+        summaries = {}
+        with self.lock:
+            for node_name, node in self.nodes.iteritems():
+                timers = dict((timer_name, dict(origin=0.0, intervals=[[interval, intervals[interval].to_dict()]
+                                                                       for interval in sorted(intervals)]))
+                              for timer_name, intervals in node['timers'].iteritems())
+                summaries[node_name] = dict(interval_secs=STREAM_INTERVAL_SECS,
+                                            transactions=node['transactions'], errors=node['errors'],
+                                            epoch_start=node['epoch_start'], epoch_finish=node['epoch_finish'],
+                                            user_groups=dict((name, dict(ug)) for name, ug in node['user_groups'].iteritems()),
+                                            timers=timers)
+        return summaries
@@ -1,63 +1,212 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
-#  License: GNU LGPLv3
-#  
-#  This file is part of Multi-Mechanize
-
-
-import SimpleXMLRPCServer
-import socket
-import thread
-    
-    
-    
-def launch_rpc_server(port, project_name, run_callback):  
-    host = socket.gethostbyaddr(socket.gethostname())[0]
-    server = SimpleXMLRPCServer.SimpleXMLRPCServer((host, port), logRequests=False)
-    server.register_instance(RemoteControl(project_name, run_callback))
-    server.register_introspection_functions()
-    print '\nMulti-Mechanize: %s listening on port %i' % (host, port)
-    print 'waiting for xml-rpc commands...\n'
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        pass
-        
-
-
-class RemoteControl(object):
-    def __init__(self, project_name, run_callback):
-        self.project_name = project_name
-        self.run_callback = run_callback
-        self.test_running = False
-        self.output_dir = None
-    
-    def run_test(self):
-        if self.test_running:
-            return 'Test Already Running'
-        else:
-            thread.start_new_thread(self.run_callback, (self,))
-            return 'Test Started'    
-    
-    def check_test_running(self):
-        return self.test_running
-    
-    def update_config(self, config):
-        with open('projects/%s/config.cfg' % self.project_name, 'w') as f:
-            f.write(config)
-            return True
- 
-    def get_config(self):
-        with open('projects/%s/config.cfg' % self.project_name, 'r') as f:
-            return f.read()
-            
-    def get_project_name(self):
-        return self.project_name
-
-    def get_results(self):
-        if self.output_dir is None:
-            return 'Results Not Available'
-        else:
-            with open(self.output_dir + 'results.csv', 'r') as f:
-                return f.read()
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
+
+
+import SimpleXMLRPCServer
+import SocketServer
+import hashlib
+import socket
+import thread
+import xmlrpclib
+import zlib
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+
+# the default and largest chunk get_results_chunk() reads (uncompressed)
+RESULTS_CHUNK_BYTES = 4 * 1024 * 1024
+MAX_RESULTS_CHUNK_BYTES = 32 * 1024 * 1024
+    
+    
+    
+class KeepAliveRequestHandler(SimpleXMLRPCServer.SimpleXMLRPCRequestHandler):
+    # lets a controller keep its connection open between calls
+    protocol_version = 'HTTP/1.1'
+
+
+
+class ThreadedXMLRPCServer(SocketServer.ThreadingMixIn, SimpleXMLRPCServer.SimpleXMLRPCServer):
+    # one thread per connection, so a controller holding its connection open 
+    # doesn't lock the others out
+    daemon_threads = True
+    
+    
+    
+def launch_rpc_server(port, project_name, run_callback, collector=None):  
+    host = socket.gethostbyaddr(socket.gethostname())[0]
+    server = ThreadedXMLRPCServer((host, port), KeepAliveRequestHandler, logRequests=False)
+    server.register_instance(RemoteControl(project_name, run_callback, port, collector))
+    server.register_introspection_functions()
+    print '\nMulti-Mechanize: %s listening on port %i' % (host, port)
+    print 'waiting for xml-rpc commands...\n'
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+        
+
+
+class RemoteControl(object):
+    def __init__(self, project_name, run_callback, port=None, collector=None):
+        self.project_name = project_name
+        self.run_callback = run_callback
+        self.port = port  # keeps the results of nodes sharing a machine apart
+        # host:port of a lib.resultsstream.ResultsCollector to push summaries to while running, 
+        # and the name to push them as.  run_test_at() sets them for one run.
+        self.collector = self.node_collector = collector
+        self.node_name = self.default_node_name = '%s:%s' % (socket.gethostname(), port)
+        self.test_running = False
+        self.output_dir = None
+        self.results_writer = None  # set by the run, for get_status()
+        self.start_epoch = None  # when a scheduled run starts, see run_test_at()
+    
+    def run_test(self):
+        if self.test_running:
+            return 'Test Already Running'
+        else:
+            # forget the schedule, and the collector, of an earlier run_test_at()
+            self.start_epoch = None
+            self.collector = self.node_collector
+            self.node_name = self.default_node_name
+            thread.start_new_thread(self.run_callback, (self,))
+            return 'Test Started'    
+    
+    def run_test_at(self, start_epoch, collector='', node_name=''):
+        """
+        start the test at start_epoch (secs since the epoch), so several 
+        nodes start together.  the run is set up right away, and start_epoch 
+        is the time origin of all its user groups, so the elapsed times of 
+        the nodes line up.  with a collector (host:port), the run pushes 
+        its summaries there, as node_name if one is given.
+        """
+        if self.test_running:
+            return 'Test Already Running'
+        self.collector = collector or self.node_collector
+        self.node_name = node_name or self.default_node_name
+        # running from now on, so a poll before the start doesn't look finished
+        self.test_running = True
+        self.output_dir = None
+        self.results_writer = None
+        self.start_epoch = float(start_epoch)
+        thread.start_new_thread(self.run_callback, (self,))
+        return 'Test Scheduled'
+    
+    def check_test_running(self):
+        return self.test_running
+    
+    def get_status(self):
+        """progress of the current (or last) run"""
+        status = dict(test_running=self.test_running, results_available=self.output_dir is not None,
+                      transactions=0, errors=0)
+        rw = self.results_writer
+        if rw is not None:
+            status['transactions'] = rw.trans_count
+            status['errors'] = rw.error_count
+        return status
+    
+    def update_config(self, config):
+        with open('projects/%s/config.cfg' % self.project_name, 'w') as f:
+            f.write(config)
+            return True
+ 
+    def get_config(self):
+        with open('projects/%s/config.cfg' % self.project_name, 'r') as f:
+            return f.read()
+            
+    def get_project_name(self):
+        return self.project_name
+
+    def get_results(self):
+        if self.output_dir is None:
+            return 'Results Not Available'
+        else:
+            with open(self.output_dir + 'results.csv', 'r') as f:
+                return f.read()
+    
+    # results.csv can be far bigger than is sensible to send in one xml-rpc 
+    # response, so it is also served in compressed chunks; see download_results().
+    # sizes and offsets go as strings, since xml-rpc ints are 32 bit.
+    
+    def get_results_info(self):
+        """size (bytes) and md5 hexdigest of results.csv"""
+        if self.output_dir is None:
+            return 'Results Not Available'
+        md5 = hashlib.md5()
+        size = 0
+        with open(self.output_dir + 'results.csv', 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), ''):
+                md5.update(block)
+                size += len(block)
+        return dict(size=str(size), md5=md5.hexdigest())
+    
+    def get_results_chunk(self, offset, length=RESULTS_CHUNK_BYTES):
+        """
+        length bytes (at most MAX_RESULTS_CHUNK_BYTES) of results.csv from 
+        offset, as dict(offset, size, crc32, data): data is the 
+        zlib-compressed bytes, size and crc32 are those of the uncompressed ones
+        """
+        if self.output_dir is None:
+            return 'Results Not Available'
+        offset = int(offset)
+        length = min(int(length), MAX_RESULTS_CHUNK_BYTES)
+        with open(self.output_dir + 'results.csv', 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return dict(offset=str(offset), size=str(len(data)), crc32='%08x' % (zlib.crc32(data) & 0xffffffff),
+                    data=xmlrpclib.Binary(zlib.compress(data, 1)))
+    
+    def get_results_summary(self):
+        """
+        the pre-aggregated results (see results.results_summary()) instead 
+        of the raw rows, as zlib-compressed json
+        """
+        if self.output_dir is None:
+            return 'Results Not Available'
+        import results  # only the nodes need the analysis
+        summary = json.dumps(results.results_summary(self.output_dir), separators=(',', ':'))
+        return xmlrpclib.Binary(zlib.compress(summary))
+
+
+
+def download_results(proxy, file_name, chunk_bytes=RESULTS_CHUNK_BYTES):
+    """
+    Copy the results.csv of the node behind the xml-rpc proxy to file_name, 
+    chunk by chunk, checking every chunk and the whole file.  Returns the 
+    number of bytes copied.
+    """
+    info = proxy.get_results_info()
+    if info == 'Results Not Available':
+        raise ValueError(info)
+    size = int(info['size'])
+    md5 = hashlib.md5()
+    offset = 0
+    with open(file_name, 'wb') as f:
+        while offset < size:
+            chunk = proxy.get_results_chunk(str(offset), chunk_bytes)
+            data = zlib.decompress(chunk['data'].data)
+            if len(data) != int(chunk['size']) or '%08x' % (zlib.crc32(data) & 0xffffffff) != chunk['crc32']:
+                raise ValueError('corrupt results chunk at offset %i' % offset)
+            if not data:
+                raise ValueError('results.csv ended at %i of %i bytes' % (offset, size))
+            f.write(data)
+            md5.update(data)
+            offset += len(data)
+    if md5.hexdigest() != info['md5']:
+        raise ValueError('checksum mismatch in results.csv')
+    return offset
+
+
+
+def download_results_summary(proxy):
+    """the pre-aggregated results of the node behind the xml-rpc proxy"""
+    summary = proxy.get_results_summary()
+    if summary == 'Results Not Available':
+        raise ValueError(summary)
+    return json.loads(zlib.decompress(summary.data))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+
+
+"""
+microbenchmark of the timing an agent does around every transaction
+
+times the clock calls on their own, then the per-iteration overhead of
+the agent loop around a no-op transaction: with the previous timing
+(time.time() and an epoch from time.mktime(time.localtime())) and with
+lib/clock.py (two monotonic readings, the epoch derived from the anchor).
+
+usage: python lib/tools/bench_agent_timing.py [iterations]
+"""
+
+
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lib import clock
+
+
+
+class Transaction(object):
+    def __init__(self):
+        self.custom_timers = {}
+
+    def run(self):
+        pass
+
+
+
+def previous_loop(trans, iterations, start_time, record):
+    default_timer = time.time
+    for i in xrange(iterations):
+        error = ''
+        start = default_timer()
+        try:
+            trans.run()
+        except Exception, e:
+            error = str(e).replace(',', '')
+        finish = default_timer()
+        scriptrun_time = finish - start
+        elapsed = time.time() - start_time
+        epoch = time.mktime(time.localtime())
+        record(elapsed, epoch, scriptrun_time, error, trans.custom_timers)
+
+
+
+def monotonic_loop(trans, iterations, start_time, record):
+    monotonic = clock.monotonic
+    start_mono = clock.WallClock().mono_at(start_time)
+    for i in xrange(iterations):
+        error = ''
+        start = monotonic()
+        try:
+            trans.run()
+        except Exception, e:
+            error = str(e).replace(',', '')
+        finish = monotonic()
+        scriptrun_time = finish - start
+        elapsed = finish - start_mono
+        epoch = start_time + elapsed
+        record(elapsed, epoch, scriptrun_time, error, trans.custom_timers)
+
+
+
+def per_call_us(func, number=200000):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print 'monotonic clock: %s' % clock.MONOTONIC_SOURCE
+    print ''
+    print 'per call:'
+    print '  clock.monotonic()                %6.3f us' % per_call_us(clock.monotonic)
+    print '  time.time()                      %6.3f us' % per_call_us(time.time)
+    print '  time.mktime(time.localtime())    %6.3f us' % per_call_us(lambda: time.mktime(time.localtime()))
+    print ''
+
+    def record(*args):
+        pass
+
+    print 'agent loop, no-op transaction, %i iterations:' % iterations
+    for name, loop in (('previous', previous_loop), ('monotonic', monotonic_loop)):
+        best = None
+        for repeat in range(3):
+            start = time.time()
+            loop(Transaction(), iterations, start, record)
+            secs = time.time() - start
+            best = secs if best is None else min(best, secs)
+        print '  %-10s %6.3f us/iteration  (%.0f iterations/s on one thread)' % (name, best / iterations * 1e6, iterations / best)
+
+    # the epochs are sub-millisecond, and follow the wall clock
+    wall_clock = clock.WallClock()
+    epoch = wall_clock.epoch(clock.monotonic())
+    print ''
+    print 'derived epoch %.6f, time.time() %.6f' % (epoch, time.time())
+
+
+
+if __name__ == '__main__':
+    main()
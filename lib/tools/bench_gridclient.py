@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+
+
+"""
+benchmark of starting a command on many nodes with lib/gridclient.py
+
+starts local xml-rpc nodes (rpcserver's threaded keep-alive server) whose
+replies take a simulated round trip, then sends every node a command the
+way grid_gui used to (a fresh ServerProxy per node, one after another)
+and with a GridClient, and compares the spread of the times the nodes
+got it (the start skew) and the total time.
+
+usage: python lib/tools/bench_gridclient.py [num nodes] [round trip ms]
+"""
+
+
+import os
+import sys
+import threading
+import time
+import xmlrpclib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lib.gridclient import GridClient
+from lib.rpcserver import ThreadedXMLRPCServer, KeepAliveRequestHandler
+
+
+
+class BenchNode(object):
+    def __init__(self, round_trip):
+        self.round_trip = round_trip
+        self.received = None
+
+    def run_test(self):
+        self.received = time.time()
+        time.sleep(self.round_trip)
+        return 'Test Started'
+
+
+
+def start_nodes(num_nodes, round_trip):
+    nodes = []
+    for i in range(num_nodes):
+        server = ThreadedXMLRPCServer(('127.0.0.1', 0), KeepAliveRequestHandler, logRequests=False)
+        node = BenchNode(round_trip)
+        server.register_instance(node)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        nodes.append((node, server.server_address))
+    return nodes
+
+
+
+def skew(nodes):
+    received = [node.received for node, address in nodes]
+    return (max(received) - min(received)) * 1000
+
+
+
+def main():
+    num_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    round_trip = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+    nodes = start_nodes(num_nodes, round_trip)
+    print '%i nodes, %.1fms round trip' % (num_nodes, round_trip * 1000)
+
+    start = time.time()
+    for node, (host, port) in nodes:
+        xmlrpclib.ServerProxy('http://%s:%s' % (host, port)).run_test()
+    print 'sequential:  skew %7.1fms  total %7.1fms' % (skew(nodes), (time.time() - start) * 1000)
+
+    client = GridClient([address for node, address in nodes])
+    client.call('run_test')  # connect
+    start = time.time()
+    replies = client.call('run_test')
+    total = (time.time() - start) * 1000
+    print 'grid client: skew %7.1fms  total %7.1fms  max latency %.1fms' % (
+        skew(nodes), total, max(reply.latency for reply in replies) * 1000)
+    client.close()
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+
+
+"""
+benchmark of the overhead of the harness itself
+
+runs projects/bench_project (a transaction that does nothing, or sleeps
+for a fixed latency, and records a number of custom timers) through
+multi-mechanize.py in a range of scenarios of threads, processes and
+timers, and reports for each:
+
+  tps        transactions per second the agents got through in run_time
+  lag p50/99 secs from a transaction finishing until the ResultsWriter
+             wrote it: its batching in the agent's process and its wait in
+             the queue.  a lag that grows with run_time means the writer
+             can't keep up, and the tps is not sustainable.
+  writer cpu cpu microsecs the ResultsWriter thread spent per transaction
+             written (linux only).  1e6 / this is the most tps one writer
+             can take.
+  analysis   secs lib/results.py took to analyze the results and make the
+             report
+
+the scenarios run in a copy of the project, which is removed afterwards.
+--save writes the numbers to a json file, and --compare checks a run
+against one, exiting 1 if any scenario's tps dropped by more than the
+tolerance.
+
+usage: python lib/tools/bench_harness.py [options] [scenario names]
+"""
+
+
+import csv
+import json
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+
+MM_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+BENCH_PROJECT = 'bench_project'
+
+# name, (processes, threads, latency secs, custom timers)
+SCENARIOS = [
+    ('noop_1x1', (1, 1, 0.0, 0)),
+    ('noop_1x10', (1, 10, 0.0, 0)),
+    ('noop_4x10', (4, 10, 0.0, 0)),
+    ('noop_timers_1x10', (1, 10, 0.0, 5)),
+    ('latency_10ms_1x50', (1, 50, 0.01, 0)),
+]
+
+CONFIG_TEMPLATE = """[global]
+run_time: %(run_time)i
+rampup: 0
+console_logging: off
+results_ts_interval: 1
+
+
+[user_group-1]
+threads: %(threads)i
+processes: %(processes)i
+script: bench_transaction.py
+script_options: latency=%(latency)r, timers=%(timers)i
+"""
+
+
+
+def run_scenario(project_name, run_time, processes, threads, latency, timers):
+    project_dir = os.path.join(MM_DIR, 'projects', project_name)
+    with open(os.path.join(project_dir, 'config.cfg'), 'w') as f:
+        f.write(CONFIG_TEMPLATE % dict(run_time=run_time, processes=processes, threads=threads,
+                                       latency=latency, timers=timers))
+    results_dir = os.path.join(project_dir, 'results')
+    if os.path.exists(results_dir):
+        shutil.rmtree(results_dir)
+    with open(os.devnull, 'w') as devnull:
+        returncode = subprocess.call([sys.executable, 'multi-mechanize.py', project_name],
+                                     cwd=MM_DIR, stdout=devnull, stderr=subprocess.STDOUT)
+    output_dirs = os.listdir(results_dir) if os.path.exists(results_dir) else []
+    if returncode != 0 or len(output_dirs) != 1:
+        sys.stderr.write('ERROR: scenario failed, exit code %s\n' % returncode)
+        return None
+    output_dir = os.path.join(results_dir, output_dirs[0])
+
+    # the agents keep going until their last transaction is done, so only
+    # count what finished within run_time
+    transactions = 0
+    with open(os.path.join(output_dir, 'results.csv'), 'rb') as f:
+        for row in csv.reader(f):
+            if float(row[1]) < run_time:
+                transactions += 1
+    with open(os.path.join(output_dir, 'harness_stats.json')) as f:
+        stats = json.load(f)
+    writer = stats['writer']
+    cpu_secs = writer['cpu_secs']
+    return dict(tps=transactions / float(run_time),
+                lag_p50=writer['queue_lag']['p50'], lag_p99=writer['queue_lag']['p99'],
+                writer_cpu=cpu_secs / writer['transactions'] * 1e6 if cpu_secs is not None and writer['transactions'] else None,
+                analysis_secs=stats['analysis_secs'])
+
+
+
+def print_results(scenarios, results, baseline=None):
+    print '%-20s %4s %7s %7s %6s %11s %11s %10s %9s' % ('scenario', 'proc', 'threads', 'latency', 'timers',
+                                                         'tps', 'lag p50/99', 'writer cpu', 'analysis')
+    for name, (processes, threads, latency, timers) in scenarios:
+        result = results.get(name)
+        line = '%-20s %4i %7i %6.0fms %6i' % (name, processes, threads, latency * 1000, timers)
+        if result is None:
+            print line + '      failed'
+            continue
+        line += ' %11.0f %5.2f/%5.2f %10s %8.2fs' % (result['tps'], result['lag_p50'], result['lag_p99'],
+                                                     '%.1fus' % result['writer_cpu'] if result['writer_cpu'] is not None else 'n/a',
+                                                     result['analysis_secs'])
+        if baseline is not None and baseline.get(name):
+            line += '  (tps %+.0f%%)' % ((result['tps'] / baseline[name]['tps'] - 1) * 100)
+        print line
+
+
+
+def main():
+    parser = optparse.OptionParser(usage='usage: %prog [options] [scenario names]')
+    parser.add_option('-r', '--run-time', dest='run_time', type='int', default=5, help='secs each scenario runs')
+    parser.add_option('-s', '--save', dest='save', help='save the results to a json file')
+    parser.add_option('-c', '--compare', dest='compare', help='compare the results to a json file saved with --save')
+    parser.add_option('-t', '--tolerance', dest='tolerance', type='float', default=10.0,
+                      help='the drop in tps (percent) that --compare allows')
+    parser.add_option('-k', '--keep', dest='keep', action='store_true', default=False,
+                      help='keep the copy of the project the scenarios ran in')
+    (opts, args) = parser.parse_args()
+
+    scenarios = [scenario for scenario in SCENARIOS if not args or scenario[0] in args]
+    if not scenarios:
+        sys.stderr.write('ERROR: no such scenario, the scenarios are: %s\n' % ', '.join(name for name, params in SCENARIOS))
+        sys.exit(1)
+    baseline = None
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)['results']
+
+    project_name = 'bench_run_%i' % os.getpid()
+    project_dir = os.path.join(MM_DIR, 'projects', project_name)
+    shutil.copytree(os.path.join(MM_DIR, 'projects', BENCH_PROJECT), project_dir)
+    results = {}
+    try:
+        for name, params in scenarios:
+            print 'running %s...' % name
+            results[name] = run_scenario(project_name, opts.run_time, *params)
+    finally:
+        if opts.keep:
+            print 'kept: %s' % project_dir
+        else:
+            shutil.rmtree(project_dir)
+
+    print ''
+    print_results(scenarios, results, baseline)
+
+    if opts.save:
+        with open(opts.save, 'w') as f:
+            json.dump(dict(run_time=opts.run_time, time=time.time(), results=results), f, indent=2)
+        print '\nsaved: %s' % opts.save
+
+    if baseline is not None:
+        regressions = [name for name, params in scenarios
+                       if results.get(name) is None or (baseline.get(name) and
+                           results[name]['tps'] < baseline[name]['tps'] * (1 - opts.tolerance / 100))]
+        if regressions:
+            sys.stderr.write('ERROR: tps regressed by more than %.0f%%: %s\n' % (opts.tolerance, ', '.join(regressions)))
+            sys.exit(1)
+
+
+
+if __name__ == '__main__':
+    main()
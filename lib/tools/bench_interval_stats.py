@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+
+
+"""
+benchmark of the per-interval timer statistics in lib/results.py
+
+feeds synthetic [elapsed, value] points, in chunks like Results.parse(),
+to a TimerSeries and makes its summary, interval table and boxplot stats,
+and compares that with the analysis as it was before the TimerSeries: a
+copy of the original timer_table_vals() and group_series(), which sort all
+of the values, group them by interval with itertools.groupby and take the
+np.percentile() of each interval.  (those gave the graphs the raw buckets,
+not boxplot stats, so the TimerSeries does a bit more.)  the tables are
+checked against each other: counts, min, avg, max and stdev exactly, the
+percentiles within the histogram's accuracy of the values around them.
+
+usage: python lib/tools/bench_interval_stats.py [num points] [run time] [interval]
+"""
+
+
+import os
+import sys
+import time
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lib.histogram import LatencyHistogram
+from lib.results import TimerSeries, PERCENTILES
+
+
+CHUNK_SIZE = 50000
+
+
+
+def group_series(points, interval):
+    """
+    Returns [key, [list of values]], where key is the maximal step
+    below each of the corresponding values.
+
+    This function may sort points.
+    """
+    points=np.asarray(points,dtype=float)
+    points[:,0]=interval*((points[:,0]-points[0,0])//interval)
+    # sort points by first column, then group by first column
+    points=points[points[:,0].argsort(),]
+    grouping=[(key,map(itemgetter(1), values))
+            for key,values in groupby(points,itemgetter(0))]
+    return grouping
+
+
+
+def legacy_timer_table_vals(timer, interval_secs):
+    """the original timer_table_vals(), with all of a timer's points at once"""
+    timer_vals=timer[:,1].copy() # must make a copy so we don't sort timer
+    timer_vals.sort()
+    n=len(timer_vals)
+    graphs={}
+    graphs['pct_50_resptime'] = {}
+    graphs['pct_80_resptime'] = {}  
+    graphs['pct_95_resptime'] = {}  
+
+    summary=dict(count=n,
+                 min=timer_vals[0],
+                 avg=np.average(timer_vals),
+                 max=timer_vals[-1],
+                 stdev=timer_vals.std(ddof=1)) #sample standard deviation
+    pct=[25,50,80,90,95]
+    for p,q in zip(pct,np.percentile(timer_vals, pct)):
+        summary['pct_%s'%p]=q
+
+    splat_series = group_series(timer, interval_secs)
+    timer_table=[]
+    for i, bucket in splat_series:
+        cnt = len(bucket)
+        if cnt == 0:
+            row=dict(interval=i, count=0, rate=0, min='N/A', avg='N/A',pct_80='N/A',pct_90='N/A',pct_95='N/A',max='N/A',stdev='N/A')
+        else:
+            bucket.sort()
+            row=dict()
+            row['interval'] = i
+            row['count'] = cnt
+            row['rate'] = cnt / float(interval_secs)
+            row['min'] = bucket[0]
+            row['avg'] = np.average(bucket)
+            row['max'] = bucket[-1]
+            row['stdev'] = np.std(bucket, ddof=1) # sample stdev
+            # not exactly percentiles, since I'm not averaging values if 
+            # the percentile doesn't fall exactly on a slot.
+            pct=[25,50,80,90,95]
+            for p,q in zip(pct,np.percentile(bucket, pct)):
+                row['pct_%s'%p]=q
+
+        timer_table.append(row)
+
+        # graph data
+        graphs['pct_50_resptime'][i] = row['pct_50']
+        graphs['pct_80_resptime'][i] = row['pct_80']
+        graphs['pct_95_resptime'][i] = row['pct_95']
+
+    return summary, timer_table, graphs, splat_series   
+
+
+
+def vectorized_interval_stats(points, interval_secs):
+    timer = TimerSeries(interval_secs)
+    for chunk_start in xrange(0, len(points), CHUNK_SIZE):
+        timer.add(points[chunk_start:chunk_start + CHUNK_SIZE])
+    return timer.timer_table_vals()
+
+
+
+def main():
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    run_time = float(sys.argv[2]) if len(sys.argv) > 2 else 3600
+    interval_secs = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    print 'generating %i points over %is, %is intervals...' % (num_points, run_time, interval_secs)
+    elapsed = np.sort(np.random.uniform(0, run_time, num_points))
+    # group_series() counts the intervals from the first point, the TimerSeries from 0
+    elapsed[0] = 0.0
+    values = np.random.lognormal(-2, 1, num_points)
+    points = np.column_stack((elapsed, values))
+
+    start = time.time()
+    summary, rows = vectorized_interval_stats(points, interval_secs)[:2]
+    vectorized_secs = time.time() - start
+    print 'vectorized: %.2fs' % vectorized_secs
+
+    start = time.time()
+    legacy_summary, legacy_rows, legacy_graphs, legacy_series = legacy_timer_table_vals(points.copy(), interval_secs)
+    legacy_secs = time.time() - start
+    print 'legacy:     %.2fs' % legacy_secs
+    print 'speedup:    %.1fx' % (legacy_secs / vectorized_secs)
+
+    for name in sorted(legacy_rows[0]):
+        if name.startswith('pct_'):
+            continue
+        ok = np.allclose([row[name] for row in rows], [row[name] for row in legacy_rows], rtol=1e-9)
+        if name in legacy_summary:
+            ok = ok and np.isclose(summary[name], legacy_summary[name], rtol=1e-9)
+        if not ok:
+            print 'MISMATCH in %s' % name
+    # np.percentile() interpolates between the two values around a percentile, 
+    # and the histogram gives the nearest of them, within its relative accuracy
+    accuracy = LatencyHistogram().relative_accuracy
+    for p in PERCENTILES:
+        name = 'pct_%s' % p
+        buckets = [bucket for i, bucket in legacy_series] + [points[:, 1]]
+        lower = np.array([np.percentile(bucket, p, interpolation='lower') for bucket in buckets])
+        higher = np.array([np.percentile(bucket, p, interpolation='higher') for bucket in buckets])
+        values = np.array([row[name] for row in rows] + [summary[name]])
+        if ((values < lower * (1 - accuracy) - 1e-12) | (values > higher * (1 + accuracy) + 1e-12)).any():
+            print 'MISMATCH in %s' % name
+
+
+
+if __name__ == '__main__':
+    main()
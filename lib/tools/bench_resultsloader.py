@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Brian Knox (taotetek@gmail.com)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+
+
+"""
+benchmark of loading results.csv into a database with lib/resultsloader.py
+
+generates a synthetic results.csv, then loads it into fresh local sqlite
+databases with the streaming bulk loader and with the previous orm loader.
+
+the previous loader's regex only matches rows whose timer blob is not
+csv-quoted, so the synthetic rows have one custom timer and no quoting.
+
+usage: python lib/tools/bench_resultsloader.py [num rows]
+"""
+
+
+import fileinput
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lib.resultsloader import (load_results_database, create_engine, sessionmaker,
+    GlobalConfig, UserGroupConfig, ResultRow, TimerRow)
+
+
+
+class BenchUserGroupConfig(object):
+    def __init__(self, name, num_threads):
+        self.name = name
+        self.num_threads = num_threads
+        self.script_file = 'bench.py'
+        self.script_options = ''
+
+
+
+def legacy_load_results_database(project_name, run_localtime, results_dir,
+        results_database, run_time, rampup, results_ts_interval,
+        user_group_configs):
+    """the orm loader, as it was"""
+    logline_re = re.compile('(.+),(.+),(.+),(.+),(.+),(.?),(\{.+\})')
+    engine = create_engine(results_database, echo=False)
+    ResultRow.metadata.create_all(engine)
+    sa_current_session = sessionmaker(bind=engine)()
+    run_id = datetime_from(run_localtime)
+    global_config = GlobalConfig(run_time, rampup, results_ts_interval)
+    sa_current_session.add(global_config)
+    for ug_config in user_group_configs:
+        global_config.user_group_configs.append(UserGroupConfig(ug_config.name,
+                ug_config.num_threads, ug_config.script_file, ug_config.script_options))
+    for line in fileinput.input([results_dir + 'results.csv']):
+        match = logline_re.match(line.rstrip())
+        if match:
+            result_row = ResultRow(project_name, run_id, match.group(1),
+                    match.group(2), match.group(3), match.group(4),
+                    match.group(5), match.group(6), match.group(7))
+            global_config.results.append(result_row)
+            timer_data = eval(match.group(7))
+            for index in timer_data:
+                result_row.timers.append(TimerRow(index, timer_data[index]))
+            sa_current_session.add(result_row)
+    sa_current_session.commit()
+    sa_current_session.close()
+
+
+
+def datetime_from(run_localtime):
+    from datetime import datetime
+    return datetime(*run_localtime[:6])
+
+
+
+def write_results(results_dir, num_rows):
+    with open(results_dir + 'results.csv', 'w') as f:
+        epoch = time.time()
+        for i in xrange(num_rows):
+            f.write('%i,%f,%i,user_group-1,%f,,{"timer_1": %f}\n' % (i + 1, i * .01, epoch + i * .01,
+                                                                     random.uniform(0, 2), random.uniform(0, 2)))
+
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    results_dir = tempfile.mkdtemp() + os.sep
+    try:
+        print 'generating %i rows...' % num_rows
+        write_results(results_dir, num_rows)
+        configs = [BenchUserGroupConfig('user_group-1', 10)]
+
+        start = time.time()
+        load_results_database('bench', time.localtime(), results_dir, 'sqlite:///%sbulk.db' % results_dir,
+                              60, 0, 10, configs)
+        bulk_secs = time.time() - start
+        print 'bulk:   %.2fs' % bulk_secs
+
+        start = time.time()
+        legacy_load_results_database('bench', time.localtime(), results_dir, 'sqlite:///%slegacy.db' % results_dir,
+                                     60, 0, 10, configs)
+        legacy_secs = time.time() - start
+        print 'legacy: %.2fs' % legacy_secs
+        print 'speedup: %.1fx' % (legacy_secs / bulk_secs)
+    finally:
+        shutil.rmtree(results_dir)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#
+#  This file is part of Multi-Mechanize
+
+
+"""
+check that the two reports of lib/coordinator.py agree
+
+writes a synthetic run at a steady rate to a temporary results dir, then
+for a range of ts_intervals analyzes it the way the coordinator does with
+the nodes' rows (Results) and with --summary-only (SummaryResults of
+results_summary()), and compares the transaction count, percentiles and
+throughput of both with each other and with the rate the run was written
+at.  the summaries the collector streams have the same 1 sec intervals
+as results_summary().  exits 1 on a mismatch.
+
+usage: python lib/tools/check_summary_results.py [tps] [run time]
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lib import results
+
+
+TS_INTERVALS = [1, 3, 5, 10]
+
+CONFIG_TEMPLATE = """[global]
+run_time: %(run_time)i
+rampup: 0
+results_ts_interval: %(ts_interval)i
+
+[user_group-1]
+threads: 1
+script: check.py
+"""
+
+
+
+def write_run(results_dir, tps, run_time):
+    """rows at a steady tps over run_time, and a few after it (that the analysis leaves out)"""
+    elapsed = np.arange(0, run_time + 1, 1.0 / tps)
+    values = np.random.lognormal(-2, 1, len(elapsed))
+    with open(os.path.join(results_dir, 'results.csv'), 'w') as f:
+        for i, (e, v) in enumerate(zip(elapsed, values)):
+            f.write('%i,%r,%r,user_group-1,%r,,{}\n' % (i + 1, e, 1.3e9 + e, v))
+
+
+
+def main():
+    tps = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    run_time = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    results_dir = tempfile.mkdtemp()
+    failed = False
+    try:
+        write_run(results_dir, tps, run_time)
+        for ts_interval in TS_INTERVALS:
+            with open(os.path.join(results_dir, 'config.cfg'), 'w') as f:
+                f.write(CONFIG_TEMPLATE % dict(run_time=run_time, ts_interval=ts_interval))
+            full = results.Results(os.path.join(results_dir, 'results.csv'), run_time, ts_interval)
+            summary = results.SummaryResults([results.results_summary(results_dir)], run_time, ts_interval)
+            full_timer = full.timers['Transactions']
+            summary_timer = summary.timers['Transactions']
+
+            checks = []
+            full_table = full_timer.timer_table_vals()[1]
+            summary_table = summary_timer.timer_table_vals()[1]
+            for name in ('interval', 'count', 'pct_50', 'pct_95'):
+                checks.append((name, np.allclose([row[name] for row in full_table],
+                                                 [row[name] for row in summary_table])))
+            full_tps = full_timer.throughput_points(run_time)
+            summary_tps = summary_timer.throughput_points(run_time)
+            checks.append(('throughput', sorted(full_tps) == sorted(summary_tps) and
+                           np.allclose([full_tps[key] for key in sorted(full_tps)],
+                                       [summary_tps[key] for key in sorted(full_tps)])))
+            checks.append(('throughput vs %i tps' % tps, np.allclose(summary_tps.values(), tps)))
+
+            mismatches = [name for name, ok in checks if not ok]
+            print 'ts_interval %2is: rows %.1f tps, summaries %.1f tps  %s' % (
+                ts_interval, np.mean(full_tps.values()), np.mean(summary_tps.values()),
+                'MISMATCH in %s' % ', '.join(mismatches) if mismatches else 'ok')
+            failed = failed or bool(mismatches)
+            os.remove(os.path.join(results_dir, results.CHECKPOINT_FILE))
+    finally:
+        shutil.rmtree(results_dir)
+    if failed:
+        sys.exit(1)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -1,342 +1,772 @@
-#!/usr/bin/env python
-#
-#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
-#  License: GNU LGPLv3 - distributed under the terms of the GNU Lesser General Public License version 3
-#  
-#  This file is part of Multi-Mechanize:
-#       Multi-Process, Multi-Threaded, Web Load Generator, with python-mechanize agents
-#
-#  requires Python 2.6+
-
-
-
-import ConfigParser
-import glob
-import multiprocessing
-import optparse
-import os
-import Queue
-import shutil
-import subprocess
-import sys
-import threading
-import time
-import lib.results as results
-import lib.progressbar as progressbar        
-
-usage = 'Usage: %prog <project name> [options]'
-parser = optparse.OptionParser(usage=usage)
-parser.add_option('-p', '--port', dest='port', type='int', help='rpc listener port')
-cmd_opts, args = parser.parse_args()
-
-try:
-    project_name = args[0]
-except IndexError:
-    sys.stderr.write('\nERROR: no project specified\n\n')
-    sys.stderr.write('usage: python multi-mechanize.py <project_name>\n')
-    sys.stderr.write('example: python multi-mechanize.py default_project\n\n')
-    sys.exit(1)  
-
-scripts_path = 'projects/%s/test_scripts' % project_name
-if not os.path.exists(scripts_path):
-    sys.stderr.write('\nERROR: can not find project: %s\n\n' % project_name)
-    sys.exit(1) 
-sys.path.append(scripts_path)          
-for f in glob.glob( '%s/*.py' % scripts_path):  # import all test scripts as modules
-    f = f.replace(scripts_path, '').replace(os.sep, '').replace('.py', '')
-    exec('import %s' % f)
-
-
-
-def main():
-    if cmd_opts.port:
-        import lib.rpcserver
-        lib.rpcserver.launch_rpc_server(cmd_opts.port, project_name, run_test)
-    else:  
-        run_test()
-        
-        
-    
-def run_test(remote_starter=None):
-    if remote_starter is not None:
-        remote_starter.test_running = True
-        remote_starter.output_dir = None
-        
-    (run_time, rampup, console_logging, results_ts_interval, 
-     user_group_configs, results_database, post_run_script, 
-     project_config_script) = configure(project_name)
-    
-    run_localtime = time.localtime() 
-    output_dir = time.strftime('projects/' + project_name + '/results/results_%Y.%m.%d_%H.%M.%S/', run_localtime) 
-    
-    # get project configuration
-    if project_config_script is not None:
-        print 'running project_config_script: %s\n' % project_config_script
-        # in python 2.7, we can just use the check_output command instead of Popen
-        process = subprocess.Popen([project_config_script], shell=True, stdout=subprocess.PIPE)
-        project_config_data = process.communicate()[0]
-    else:
-        project_config_data=''
-
-    # this queue is shared between all processes/threads
-    queue = multiprocessing.Queue()
-    rw = ResultsWriter(queue, output_dir, console_logging)
-    rw.daemon = True
-    rw.start()
-    
-    user_groups = [] 
-    for i, ug_config in enumerate(user_group_configs):
-        ug = UserGroup(queue, i, ug_config.name, ug_config.num_threads, 
-                       ug_config.script_file, ug_config.script_options, 
-                       run_time, rampup)
-
-        user_groups.append(ug)    
-    for user_group in user_groups:
-        user_group.start()
-        
-    start_time = time.time() 
-    
-    if console_logging:
-        for user_group in user_groups:
-            user_group.join()
-    else:
-        print '\n  user_groups:  %i' % len(user_groups)
-        print '  threads: %i\n' % (ug_config.num_threads * len(user_groups))
-        p = progressbar.ProgressBar(run_time)
-        elapsed = 0
-        while elapsed < (run_time + 1):
-            p.update_time(elapsed)
-            if sys.platform.startswith('win'):
-                print '%s   transactions: %i  timers: %i  errors: %i\r' % (p, rw.trans_count, rw.timer_count, rw.error_count),
-            else:
-                print '%s   transactions: %i  timers: %i  errors: %i' % (p, rw.trans_count, rw.timer_count, rw.error_count)
-                sys.stdout.write(chr(27) + '[A' )
-            time.sleep(1)
-            elapsed = time.time() - start_time
-        
-        print p
-        
-        while [user_group for user_group in user_groups if user_group.is_alive()] != []:
-            if sys.platform.startswith('win'):
-                print 'waiting for all requests to finish...\r',
-            else:
-                print 'waiting for all requests to finish...\r'
-                sys.stdout.write(chr(27) + '[A' )
-            time.sleep(.5)
-            
-        if not sys.platform.startswith('win'):
-            print
-
-    # all agents are done running at this point
-    time.sleep(.2) # make sure the writer queue is flushed
-    print '\n\nanalyzing results...\n'
-    results.output_results(output_dir, 'results.csv', run_time, rampup, results_ts_interval, user_group_configs, project_config_data)
-    print 'created: %sresults.html\n' % output_dir
-    
-    # copy config file to results directory
-    project_config = os.sep.join(['projects', project_name, 'config.cfg'])
-    saved_config = os.sep.join([output_dir, 'config.cfg'])
-    shutil.copy(project_config, saved_config)
-    
-    with open(os.path.join(output_dir, 'project_config_data.txt'),'w') as f:
-        f.write(project_config_data)
-
-
-    if results_database is not None:
-        print 'loading results into database: %s\n' % results_database
-        import lib.resultsloader
-        lib.resultsloader.load_results_database(project_name, run_localtime, output_dir, results_database, 
-                run_time, rampup, results_ts_interval, user_group_configs)
-    
-    if post_run_script is not None:
-        print 'running post_run_script: %s\n' % post_run_script
-        subprocess.call(post_run_script)
-        
-    print 'done.\n'
-    
-    if remote_starter is not None:
-        remote_starter.test_running = False
-        remote_starter.output_dir = output_dir
-    
-    return
-    
-    
-    
-def configure(project_name):
-    user_group_configs = []
-    config = ConfigParser.SafeConfigParser()
-    config.read( 'projects/%s/config.cfg' % project_name)
-    for section in config.sections():
-        if section == 'global':
-            run_time = config.getint(section, 'run_time')
-            rampup = config.getint(section, 'rampup')
-            console_logging = config.getboolean(section, 'console_logging')
-            results_ts_interval = config.getint(section, 'results_ts_interval')
-            try:
-                results_database = config.get(section, 'results_database')
-            except ConfigParser.NoOptionError:
-                results_database = None
-            try:
-                post_run_script = config.get(section, 'post_run_script')
-            except ConfigParser.NoOptionError:
-                post_run_script = None
-            try:
-                project_config_script = config.get(section, 'project_config_script')
-            except ConfigParser.NoOptionError:
-                project_config_script = None
-        else:
-            threads = config.getint(section, 'threads')
-            script = config.get(section, 'script')
-            try:
-                script_options = config.get(section, 'script_options')
-            except ConfigParser.NoOptionError:
-                script_options = ''
-            user_group_name = section
-            ug_config = UserGroupConfig(threads, user_group_name, script, script_options)
-            user_group_configs.append(ug_config)
-
-    return (run_time, rampup, console_logging, results_ts_interval, user_group_configs, results_database, post_run_script, project_config_script)
-    
-
-
-class UserGroupConfig(object):
-    def __init__(self, num_threads, name, script_file, script_options):
-        self.num_threads = num_threads
-        self.name = name
-        self.script_file = script_file
-        self.script_options = script_options
-
-    
-class UserGroup(multiprocessing.Process):
-    def __init__(self, queue, process_num, user_group_name, num_threads, script_file, script_options, run_time, rampup):
-        multiprocessing.Process.__init__(self)
-        self.queue = queue
-        self.process_num = process_num
-        self.user_group_name = user_group_name
-        self.num_threads = num_threads
-        self.script_file = script_file
-        self.script_options = script_options
-        self.run_time = run_time
-        self.rampup = rampup
-        self.start_time = time.time()
-        
-    def run(self):
-        threads = []
-        for i in range(self.num_threads):
-            spacing = float(self.rampup) / float(self.num_threads)
-            if i > 0:
-                time.sleep(spacing)
-            agent_thread = Agent(self.queue, self.process_num, i, self.start_time, self.run_time, self.user_group_name, 
-                                 self.script_file, self.script_options)
-            agent_thread.daemon = True
-            threads.append(agent_thread)
-            agent_thread.start()            
-        for agent_thread in threads:
-            agent_thread.join()
-        
-
-
-class Agent(threading.Thread):
-    def __init__(self, queue, process_num, thread_num, start_time, run_time, user_group_name, script_file, script_options):
-        threading.Thread.__init__(self)
-        self.queue = queue
-        self.process_num = process_num
-        self.thread_num = thread_num
-        self.start_time = start_time
-        self.run_time = run_time
-        self.user_group_name = user_group_name
-        self.script_file = script_file
-        self.script_options = script_options
-        
-        # choose most accurate timer to use (time.clock has finer granularity than time.time on windows, but shouldn't be used on other systems)
-        if sys.platform.startswith('win'):
-            self.default_timer = time.clock
-        else:
-            self.default_timer = time.time
-    
-    
-    def run(self):
-        elapsed = 0
-        
-        if self.script_file.lower().endswith('.py'):
-            module_name = self.script_file.replace('.py', '')
-        else:
-            sys.stderr.write('ERROR: scripts must have .py extension. can not run test script: %s.  aborting user group: %s\n' % (self.script_file, self.user_group_name))
-            return
-        try:
-            cmd=module_name + '.Transaction('+self.script_options+')'
-            trans = eval(cmd)
-        except NameError, e:
-            sys.stderr.write('ERROR: can not find test script: %s.  aborting user group: %s\n' % (self.script_file, self.user_group_name))
-            return
-        except Exception, e:
-            sys.stderr.write('ERROR: failed initializing Transaction: %s.  aborting user group: %s\n' % (self.script_file, self.user_group_name))
-            return
-        
-        trans.custom_timers = {}
-        
-        # scripts have access to these vars, which can be useful for loading unique data
-        trans.thread_num = self.thread_num
-        trans.process_num = self.process_num
-            
-        while elapsed < self.run_time:
-            error = ''
-            start = self.default_timer()  
-            
-            try:
-                trans.run()
-            except Exception, e:  # test runner catches all script exceptions here
-                error = str(e).replace(',', '')
-
-            finish = self.default_timer()
-            
-            scriptrun_time = finish - start
-            elapsed = time.time() - self.start_time 
-
-            epoch = time.mktime(time.localtime())
-            
-            fields = (elapsed, epoch, self.user_group_name, scriptrun_time, error, trans.custom_timers)
-            self.queue.put(fields)
-            
-
-
-class ResultsWriter(threading.Thread):
-    def __init__(self, queue, output_dir, console_logging):
-        threading.Thread.__init__(self)
-        self.queue = queue
-        self.console_logging = console_logging
-        self.output_dir = output_dir
-        self.trans_count = 0
-        self.timer_count = 0
-        self.error_count = 0
-        
-        try:
-            os.makedirs(self.output_dir, 0755)
-        except OSError:
-            sys.stderr.write('ERROR: Can not create output directory\n')
-            sys.exit(1)    
-    
-    def run(self):
-        import csv
-        import json
-        with open(self.output_dir + 'results.csv', 'wb') as filestream:
-            f=csv.writer(filestream)
-            while True:
-                try:
-                    elapsed, epoch, self.user_group_name, scriptrun_time, error, custom_timers = self.queue.get(False)
-                    self.trans_count += 1
-                    self.timer_count += len(custom_timers)
-                    if error != '':
-                        self.error_count += 1
-                    f.writerow((int(self.trans_count), elapsed, epoch, self.user_group_name, scriptrun_time, error, json.dumps(custom_timers)))
-                    filestream.flush()
-                    if self.console_logging:
-                        print '%i, %.3f, %i, %s, %.3f, %s, %s' % (self.trans_count, elapsed, epoch, self.user_group_name, scriptrun_time, error, repr(custom_timers))
-                except Queue.Empty:
-                    time.sleep(.05)
-
-
-
-if __name__ == '__main__':
-    main()
-
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3 - distributed under the terms of the GNU Lesser General Public License version 3
+#  
+#  This file is part of Multi-Mechanize:
+#       Multi-Process, Multi-Threaded, Web Load Generator, with python-mechanize agents
+#
+#  requires Python 2.6+
+
+
+
+import array
+import ConfigParser
+import glob
+import multiprocessing
+import optparse
+import os
+import Queue
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import lib.arrivals
+import lib.clock
+import lib.histogram
+import lib.livestats as livestats
+import lib.results as results
+import lib.progressbar as progressbar        
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+
+# agents ship results to the writer in batches of at most this many transactions,
+# or whatever has accumulated after this many seconds, whichever comes first
+RESULTS_BATCH_SIZE = 1000
+RESULTS_BATCH_SECS = .25
+
+# the live stats on the console and the live_stats_port cover this many seconds
+LIVE_STATS_WINDOW = 10
+
+# open-model (arrival_rate) transactions that start later than this after their 
+# scheduled time are counted as late launches
+LATE_LAUNCH_SECS = .01
+
+usage = 'Usage: %prog <project name> [options]'
+parser = optparse.OptionParser(usage=usage)
+parser.add_option('-p', '--port', dest='port', type='int', help='rpc listener port')
+parser.add_option('-c', '--collector', dest='collector', help='host:port of a results collector to push summaries to')
+cmd_opts, args = parser.parse_args()
+
+try:
+    project_name = args[0]
+except IndexError:
+    sys.stderr.write('\nERROR: no project specified\n\n')
+    sys.stderr.write('usage: python multi-mechanize.py <project_name>\n')
+    sys.stderr.write('example: python multi-mechanize.py default_project\n\n')
+    sys.exit(1)  
+
+scripts_path = 'projects/%s/test_scripts' % project_name
+if not os.path.exists(scripts_path):
+    sys.stderr.write('\nERROR: can not find project: %s\n\n' % project_name)
+    sys.exit(1) 
+sys.path.append(scripts_path)          
+for f in glob.glob( '%s/*.py' % scripts_path):  # import all test scripts as modules
+    f = f.replace(scripts_path, '').replace(os.sep, '').replace('.py', '')
+    exec('import %s' % f)
+
+
+
+def main():
+    if cmd_opts.port:
+        import lib.rpcserver
+        lib.rpcserver.launch_rpc_server(cmd_opts.port, project_name, run_test, cmd_opts.collector)
+    else:  
+        run_test()
+        
+        
+    
+def run_test(remote_starter=None):
+    if remote_starter is not None:
+        remote_starter.test_running = True
+        remote_starter.output_dir = None
+        
+    (run_time, rampup, console_logging, results_ts_interval, 
+     user_group_configs, results_database, post_run_script, 
+     project_config_script, results_store, live_stats_port, results_database_live,
+     graph_processes, graph_max_points, report_mode) = configure(project_name)
+    
+    # a controller may schedule the start, for all its nodes at once
+    start_epoch = getattr(remote_starter, 'start_epoch', None)
+    run_localtime = time.localtime(start_epoch) 
+    output_dir = time.strftime('projects/' + project_name + '/results/results_%Y.%m.%d_%H.%M.%S/', run_localtime) 
+    if getattr(remote_starter, 'port', None) is not None:
+        # several nodes on one machine may start in the same second
+        output_dir = '%s_%i/' % (output_dir.rstrip('/'), remote_starter.port)
+    
+    # get project configuration
+    if project_config_script is not None:
+        print 'running project_config_script: %s\n' % project_config_script
+        # in python 2.7, we can just use the check_output command instead of Popen
+        process = subprocess.Popen([project_config_script], shell=True, stdout=subprocess.PIPE)
+        project_config_data = process.communicate()[0]
+    else:
+        project_config_data=''
+
+    # this queue is shared between all processes/threads
+    queue = multiprocessing.Queue()
+    if remote_starter is not None:
+        collector, node_name = remote_starter.collector, remote_starter.node_name
+    else:
+        collector, node_name = cmd_opts.collector, socket.gethostname()
+    if results_database is not None and results_database_live:
+        import lib.resultsloader
+        db_sink = lib.resultsloader.DatabaseSink(project_name, run_localtime, results_database,
+                run_time, rampup, results_ts_interval, user_group_configs, node_name=node_name)
+        db_sink.start()
+    else:
+        db_sink = None
+    if collector:
+        import lib.resultsstream
+        streamer = lib.resultsstream.ResultsStreamer(collector, node_name)
+        streamer.start()
+        print 'pushing summaries to: %s' % collector
+    else:
+        streamer = None
+    rw = ResultsWriter(queue, output_dir, console_logging, results_store, db_sink, streamer)
+    rw.daemon = True
+    rw.start()
+    if remote_starter is not None:
+        remote_starter.results_writer = rw
+    if live_stats_port is not None:
+        live_stats_server = livestats.LiveStatsServer(rw.live_stats, live_stats_port)
+        live_stats_server.start()
+        print 'live stats: http://127.0.0.1:%i/' % live_stats_port
+    
+    # each user group runs in ug_config.processes processes, with its threads
+    # dealt out between them.  every process gets its own process_num.
+    # they all share one start time, the origin of the elapsed times, so 
+    # their intervals line up (and those of all nodes of a scheduled run).
+    if start_epoch is None:
+        start_epoch = time.time()
+    user_groups = [] 
+    process_num = 0
+    for ug_config in user_group_configs:
+        num_processes = max(1, min(ug_config.processes, ug_config.num_threads))
+        for shard in range(num_processes):
+            ug = UserGroup(queue, process_num, ug_config.name, ug_config.num_threads, 
+                           ug_config.script_file, ug_config.script_options, 
+                           run_time, rampup, ug_config.engine, 
+                           thread_nums=range(shard, ug_config.num_threads, num_processes),
+                           arrival_schedule=ug_config.arrival_schedule, shard=(shard, num_processes),
+                           start_time=start_epoch)
+            user_groups.append(ug)    
+            process_num += 1
+    for user_group in user_groups:
+        user_group.start()
+        
+    start_time = start_epoch
+    delay = start_time - time.time()
+    if delay > 0:
+        print 'starting at: %s' % time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))
+        time.sleep(delay)
+    elif remote_starter is not None and remote_starter.start_epoch is not None:
+        sys.stderr.write('WARNING: user groups started %.3fs after the scheduled start\n' % -delay)
+    
+    if console_logging:
+        for user_group in user_groups:
+            user_group.join()
+    else:
+        print '\n  user_groups:  %i' % len(user_group_configs)
+        print '  processes: %i' % len(user_groups)
+        print '  threads: %i\n' % sum(ug_config.num_threads for ug_config in user_group_configs)
+        p = progressbar.ProgressBar(run_time)
+        elapsed = 0
+        while elapsed < (run_time + 1):
+            p.update_time(elapsed)
+            status = '%s   transactions: %i  timers: %i  errors: %i  queue: %i  lag: %.2fs' % (p, rw.trans_count, rw.timer_count, 
+                                                                                            rw.error_count, rw.queue_depth(), rw.writer_lag)
+            if db_sink is not None:
+                status += '  db: %i' % db_sink.loaded
+            if rw.late_count or rw.missed_count:
+                status += '  late: %i  missed: %i' % (rw.late_count, rw.missed_count)
+            live_transactions = rw.live_stats.snapshot()['timers'].get('Transactions')
+            if live_transactions is not None:
+                status += '  tps: %.1f  p95: %.3fs' % (live_transactions['throughput'], live_transactions['p95'])
+            if sys.platform.startswith('win'):
+                print status + '\r',
+            else:
+                print status
+                sys.stdout.write(chr(27) + '[A' )
+            time.sleep(1)
+            elapsed = time.time() - start_time
+        
+        print p
+        
+        while [user_group for user_group in user_groups if user_group.is_alive()] != []:
+            if sys.platform.startswith('win'):
+                print 'waiting for all requests to finish...\r',
+            else:
+                print 'waiting for all requests to finish...\r'
+                sys.stdout.write(chr(27) + '[A' )
+            time.sleep(.5)
+            
+        if not sys.platform.startswith('win'):
+            print
+
+    # all agents are done running at this point, and each user group flushed its
+    # results buffer before exiting.  tell the writer to finish up and wait for it.
+    queue.put(None)
+    rw.join()
+    if db_sink is not None:
+        db_sink.close()
+    if streamer is not None:
+        streamer.close()
+    if live_stats_port is not None:
+        live_stats_server.stop()
+    print '\n\nanalyzing results...\n'
+    analysis_start = time.time()
+    results.output_results(output_dir, 'results.csv', run_time, rampup, results_ts_interval, user_group_configs, project_config_data,
+                           graph_processes, graph_max_points, report_mode)
+    analysis_secs = time.time() - analysis_start
+    print 'created: %sresults.html\n' % output_dir
+    
+    # what the harness itself cost, for lib/tools/bench_harness.py and capacity planning
+    writer_stats = rw.stats()
+    with open(os.path.join(output_dir, 'harness_stats.json'), 'w') as f:
+        json.dump(dict(run_time=run_time, writer=writer_stats, analysis_secs=analysis_secs), f, indent=2)
+    print 'writer: %i batches  lag p99: %.3fs  cpu: %s' % (writer_stats['batches'], writer_stats['queue_lag']['p99'],
+                                                             '%.2fs' % writer_stats['cpu_secs'] if writer_stats['cpu_secs'] is not None else 'n/a')
+    print 'analysis: %.2fs\n' % analysis_secs
+    
+    # copy config file to results directory
+    project_config = os.sep.join(['projects', project_name, 'config.cfg'])
+    saved_config = os.sep.join([output_dir, 'config.cfg'])
+    shutil.copy(project_config, saved_config)
+    
+    with open(os.path.join(output_dir, 'project_config_data.txt'),'w') as f:
+        f.write(project_config_data)
+
+
+    if db_sink is not None:
+        if db_sink.failed:
+            print 'loading results into database failed after %i results: %s\n' % (db_sink.loaded, results_database)
+        else:
+            print 'loaded %i results into database: %s\n' % (db_sink.loaded, results_database)
+    elif results_database is not None:
+        print 'loading results into database: %s\n' % results_database
+        import lib.resultsloader
+        lib.resultsloader.load_results_database(project_name, run_localtime, output_dir, results_database, 
+                run_time, rampup, results_ts_interval, user_group_configs, node_name=node_name)
+    
+    if post_run_script is not None:
+        print 'running post_run_script: %s\n' % post_run_script
+        subprocess.call(post_run_script)
+        
+    print 'done.\n'
+    
+    if remote_starter is not None:
+        remote_starter.test_running = False
+        remote_starter.output_dir = output_dir
+    
+    return
+    
+    
+    
+def configure(project_name):
+    user_group_configs = []
+    config = ConfigParser.SafeConfigParser()
+    config.read( 'projects/%s/config.cfg' % project_name)
+    # processes per user group can be set globally, and overridden per user group
+    try:
+        default_processes = config.get('global', 'processes')
+    except (ConfigParser.NoSectionError, ConfigParser.NoOptionError):
+        default_processes = '1'
+    for section in config.sections():
+        if section == 'global':
+            run_time = config.getint(section, 'run_time')
+            rampup = config.getint(section, 'rampup')
+            console_logging = config.getboolean(section, 'console_logging')
+            results_ts_interval = config.getint(section, 'results_ts_interval')
+            try:
+                results_database = config.get(section, 'results_database')
+            except ConfigParser.NoOptionError:
+                results_database = None
+            try:
+                post_run_script = config.get(section, 'post_run_script')
+            except ConfigParser.NoOptionError:
+                post_run_script = None
+            try:
+                project_config_script = config.get(section, 'project_config_script')
+            except ConfigParser.NoOptionError:
+                project_config_script = None
+            try:
+                results_store = config.getboolean(section, 'results_store')
+            except ConfigParser.NoOptionError:
+                results_store = False
+            try:
+                live_stats_port = config.getint(section, 'live_stats_port')
+            except ConfigParser.NoOptionError:
+                live_stats_port = None
+            try:
+                results_database_live = config.getboolean(section, 'results_database_live')
+            except ConfigParser.NoOptionError:
+                results_database_live = False
+            try:
+                graph_processes = config.getint(section, 'graph_processes')
+            except ConfigParser.NoOptionError:
+                graph_processes = None
+            try:
+                graph_max_points = config.getint(section, 'graph_max_points')
+            except ConfigParser.NoOptionError:
+                graph_max_points = None
+            try:
+                report_mode = config.get(section, 'report_mode')
+            except ConfigParser.NoOptionError:
+                report_mode = 'static'
+        else:
+            threads = config.getint(section, 'threads')
+            script = config.get(section, 'script')
+            try:
+                script_options = config.get(section, 'script_options')
+            except ConfigParser.NoOptionError:
+                script_options = ''
+            try:
+                engine = config.get(section, 'engine')
+            except ConfigParser.NoOptionError:
+                engine = 'threads'
+            try:
+                processes = config.get(section, 'processes')
+            except ConfigParser.NoOptionError:
+                processes = default_processes
+            if processes.strip().lower() == 'auto':
+                processes = multiprocessing.cpu_count()
+            else:
+                processes = int(processes)
+            # with an arrival_rate, threads is the size of the worker pool that 
+            # runs the transactions launched on the schedule
+            try:
+                try:
+                    arrival_profile = config.get(section, 'arrival_profile')
+                except ConfigParser.NoOptionError:
+                    arrival_profile = 'step'
+                arrival_schedule = lib.arrivals.ArrivalSchedule.parse(config.get(section, 'arrival_rate'), arrival_profile)
+            except ConfigParser.NoOptionError:
+                arrival_schedule = None
+            # secs each thread is expected to take per transaction, for correcting the 
+            # analysis for coordinated omission
+            try:
+                expected_interval = config.getfloat(section, 'expected_interval')
+            except ConfigParser.NoOptionError:
+                expected_interval = None
+            user_group_name = section
+            ug_config = UserGroupConfig(threads, user_group_name, script, script_options, engine, processes, arrival_schedule, 
+                                        expected_interval)
+            user_group_configs.append(ug_config)
+
+    return (run_time, rampup, console_logging, results_ts_interval, user_group_configs, results_database, post_run_script, project_config_script, results_store, live_stats_port, results_database_live, graph_processes, graph_max_points, report_mode)
+    
+
+
+class UserGroupConfig(object):
+    def __init__(self, num_threads, name, script_file, script_options, engine='threads', processes=1, arrival_schedule=None, 
+                 expected_interval=None):
+        self.num_threads = num_threads
+        self.name = name
+        self.script_file = script_file
+        self.script_options = script_options
+        self.engine = engine
+        self.processes = processes
+        self.arrival_schedule = arrival_schedule
+        self.expected_interval = expected_interval
+
+    
+class UserGroup(multiprocessing.Process):
+    def __init__(self, queue, process_num, user_group_name, num_threads, script_file, script_options, run_time, rampup, 
+                 engine='threads', thread_nums=None, arrival_schedule=None, shard=(0, 1), start_time=None):
+        multiprocessing.Process.__init__(self)
+        self.queue = queue
+        self.process_num = process_num
+        self.user_group_name = user_group_name
+        self.num_threads = num_threads
+        self.script_file = script_file
+        self.script_options = script_options
+        self.run_time = run_time
+        self.rampup = rampup
+        self.engine = engine
+        # the threads of the user group that this process runs (all of them, unless 
+        # the user group is split over several processes)
+        if thread_nums is None:
+            thread_nums = range(num_threads)
+        self.thread_nums = thread_nums
+        # open model: transactions are launched on this schedule (this process 
+        # gets its shard of it) instead of back-to-back by each thread
+        self.arrival_schedule = arrival_schedule
+        self.shard = shard
+        # the run's time origin, shared by all user groups
+        if start_time is None:
+            start_time = time.time()
+        self.start_time = start_time
+        
+    def run(self):
+        if self.engine == 'gevent':
+            try:
+                import gevent
+                import gevent.monkey
+            except ImportError:
+                sys.stderr.write('ERROR: can not import gevent, which is needed for engine: gevent.  aborting user group: %s\n' % self.user_group_name)
+                return
+            # run the agents as greenlets on one event loop, so blocking socket calls 
+            # and sleeps in the test scripts switch to another agent instead of 
+            # blocking.  real threads are left alone, the results queue relies on them.
+            gevent.monkey.patch_all(thread=False)
+        elif self.engine != 'threads':
+            sys.stderr.write('ERROR: unknown engine: %s (use threads or gevent).  aborting user group: %s\n' % (self.engine, self.user_group_name))
+            return
+            
+        # this process's wall-clock anchor: the agents time with the monotonic 
+        # clock, and derive their epochs from it
+        self.clock = lib.clock.WallClock()
+        self.start_mono = self.clock.mono_at(self.start_time)
+        results_buffer = ResultsBuffer(self.queue, self.user_group_name)
+        results_buffer.start()
+        arrivals = None
+        if self.arrival_schedule is not None:
+            if self.engine == 'gevent':
+                import gevent.queue
+                arrivals = gevent.queue.Queue()
+                gevent.spawn(self.__schedule_arrivals, arrivals)
+            else:
+                arrivals = Queue.Queue()
+                scheduler = threading.Thread(target=self.__schedule_arrivals, args=(arrivals,))
+                scheduler.daemon = True
+                scheduler.start()
+        agents = []
+        for i in self.thread_nums:
+            # wait for this thread's turn in the ramp-up of the whole user group,
+            # so the spacing holds however the threads are split between processes.
+            # an open-model worker pool starts at once, the schedule does the ramping.
+            spacing = float(self.rampup) / float(self.num_threads)
+            delay = self.start_mono + i * spacing - lib.clock.monotonic()
+            if delay > 0 and arrivals is None:
+                time.sleep(delay)
+            agent = Agent(results_buffer, self.process_num, i, self.start_time, self.run_time, self.user_group_name, 
+                          self.script_file, self.script_options, arrivals, self.clock)
+            if self.engine == 'gevent':
+                agents.append(gevent.spawn(agent.run))
+            else:
+                agent.daemon = True
+                agents.append(agent)
+                agent.start()            
+        for agent in agents:
+            agent.join()
+        results_buffer.close()
+        
+    def __schedule_arrivals(self, arrivals):
+        # put each launch time (a monotonic reading) on the queue when it is due, 
+        # for the first free agent
+        shard, num_shards = self.shard
+        for offset in self.arrival_schedule.launch_times(self.run_time, 1.0 / num_shards, float(shard) / num_shards):
+            launch = self.start_mono + offset
+            delay = launch - lib.clock.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            arrivals.put(launch)
+        for i in self.thread_nums:
+            arrivals.put(None)
+        
+
+
+class Agent(threading.Thread):
+    def __init__(self, results_buffer, process_num, thread_num, start_time, run_time, user_group_name, script_file, script_options, arrivals=None, 
+                 clock=None):
+        threading.Thread.__init__(self)
+        self.results_buffer = results_buffer
+        self.process_num = process_num
+        self.thread_num = thread_num
+        self.start_time = start_time
+        self.run_time = run_time
+        self.user_group_name = user_group_name
+        self.script_file = script_file
+        self.script_options = script_options
+        self.arrivals = arrivals  # launch times to run transactions at, for open-model user groups
+        # transactions are timed with the monotonic clock; the clock's anchor gives 
+        # the epoch of the start_time on it
+        if clock is None:
+            clock = lib.clock.WallClock()
+        self.start_mono = clock.mono_at(start_time)
+    
+    
+    def run(self):
+        elapsed = 0
+        
+        if self.script_file.lower().endswith('.py'):
+            module_name = self.script_file.replace('.py', '')
+        else:
+            sys.stderr.write('ERROR: scripts must have .py extension. can not run test script: %s.  aborting user group: %s\n' % (self.script_file, self.user_group_name))
+            return
+        try:
+            cmd=module_name + '.Transaction('+self.script_options+')'
+            trans = eval(cmd)
+        except NameError, e:
+            sys.stderr.write('ERROR: can not find test script: %s.  aborting user group: %s\n' % (self.script_file, self.user_group_name))
+            return
+        except Exception, e:
+            sys.stderr.write('ERROR: failed initializing Transaction: %s.  aborting user group: %s\n' % (self.script_file, self.user_group_name))
+            return
+        
+        trans.custom_timers = {}
+        
+        # scripts have access to these vars, which can be useful for loading unique data
+        trans.thread_num = self.thread_num
+        trans.process_num = self.process_num
+        
+        if self.arrivals is not None:
+            self.run_arrivals(trans)
+            return
+            
+        monotonic = lib.clock.monotonic
+        while elapsed < self.run_time:
+            error = ''
+            start = monotonic()
+            
+            try:
+                trans.run()
+            except Exception, e:  # test runner catches all script exceptions here
+                error = str(e).replace(',', '')
+
+            finish = monotonic()
+            
+            scriptrun_time = finish - start
+            elapsed = finish - self.start_mono
+            epoch = self.start_time + elapsed
+            
+            self.results_buffer.add(elapsed, epoch, scriptrun_time, error, trans.custom_timers)
+            
+    
+    def run_arrivals(self, trans):
+        # open model: run a transaction for each launch time taken from the schedule
+        monotonic = lib.clock.monotonic
+        while True:
+            launch = self.arrivals.get()
+            if launch is None:
+                break
+            start = monotonic()
+            if start - self.start_mono >= self.run_time:
+                # the run ended before a worker was free to start this one
+                self.results_buffer.count('missed')
+                continue
+            launch_delay = start - launch
+            if launch_delay > LATE_LAUNCH_SECS:
+                self.results_buffer.count('late')
+            
+            error = ''
+            try:
+                trans.run()
+            except Exception, e:  # test runner catches all script exceptions here
+                error = str(e).replace(',', '')
+                
+            finish = monotonic()
+            
+            # measured from when the transaction was due to start, not from when it 
+            # did, so waiting for a free worker counts in the response time
+            scriptrun_time = finish - launch
+            elapsed = finish - self.start_mono
+            epoch = self.start_time + elapsed
+            
+            custom_timers = dict(trans.custom_timers)
+            custom_timers['Launch_Delay'] = launch_delay
+            self.results_buffer.add(elapsed, epoch, scriptrun_time, error, custom_timers)
+            
+
+
+class ResultsBuffer(object):
+    """
+    Collects the results of all agents in a user group process and puts them 
+    on the writer queue in batches, instead of one queue item per transaction.
+
+    A batch is (user_group_name, sent_time, timings, errors, custom_timers,
+    counters): timings packs the fixed-layout part of each record (elapsed, 
+    epoch, scriptrun_time) as doubles, errors maps record index -> error for 
+    the records that failed, custom_timers holds one dict per record, and 
+    counters holds event counts since the last batch (e.g. late launches).
+    """
+    def __init__(self, queue, user_group_name, batch_size=RESULTS_BATCH_SIZE, batch_secs=RESULTS_BATCH_SECS):
+        self.queue = queue
+        self.user_group_name = user_group_name
+        self.batch_size = batch_size
+        self.batch_secs = batch_secs
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.__reset()
+        
+    def __reset(self):
+        self.timings = array.array('d')
+        self.errors = {}
+        self.custom_timers = []
+        self.counters = {}
+        self.batch_start = None
+        
+    def __flush(self):
+        if self.custom_timers or self.counters:
+            self.queue.put((self.user_group_name, time.time(), self.timings.tostring(), self.errors, self.custom_timers, 
+                            self.counters))
+            self.__reset()
+            
+    def add(self, elapsed, epoch, scriptrun_time, error, custom_timers):
+        with self.lock:
+            if error != '':
+                self.errors[len(self.custom_timers)] = error
+            self.timings.extend((elapsed, epoch, scriptrun_time))
+            # scripts reuse their custom_timers dict, so keep a snapshot of it
+            self.custom_timers.append(dict(custom_timers))
+            if self.batch_start is None:
+                self.batch_start = time.time()
+            if len(self.custom_timers) >= self.batch_size:
+                self.__flush()
+    
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+            if self.batch_start is None:
+                self.batch_start = time.time()
+    
+    def flush(self):
+        with self.lock:
+            self.__flush()
+    
+    def start(self):
+        # time-based flushing, so slow transactions don't sit in the buffer
+        flusher = threading.Thread(target=self.__flush_stale)
+        flusher.daemon = True
+        flusher.start()
+        
+    def __flush_stale(self):
+        while not self.closed.is_set():
+            self.closed.wait(self.batch_secs)
+            with self.lock:
+                if self.batch_start is not None and time.time() - self.batch_start >= self.batch_secs:
+                    self.__flush()
+    
+    def close(self):
+        self.closed.set()
+        self.flush()
+        
+        
+        
+class ResultsWriter(threading.Thread):
+    def __init__(self, queue, output_dir, console_logging, results_store=False, db_sink=None, streamer=None):
+        threading.Thread.__init__(self)
+        self.queue = queue
+        self.console_logging = console_logging
+        self.output_dir = output_dir
+        self.results_store = results_store
+        self.db_sink = db_sink  # a lib.resultsloader.DatabaseSink, to load results while running
+        self.streamer = streamer  # a lib.resultsstream.ResultsStreamer, to push summaries while running
+        self.trans_count = 0
+        self.timer_count = 0
+        self.error_count = 0
+        self.late_count = 0  # open-model launches that started late
+        self.missed_count = 0  # open-model launches that never started
+        self.writer_lag = 0.0  # secs the oldest transaction of the last batch waited to be written
+        self.queue_lag = lib.histogram.LatencyHistogram()  # secs every transaction waited to be written
+        self.batch_count = 0
+        self.cpu_secs = None  # cpu secs of the writer thread, where they can be measured
+        self.live_stats = livestats.LiveStats(LIVE_STATS_WINDOW)
+        
+        try:
+            os.makedirs(self.output_dir, 0755)
+        except OSError:
+            sys.stderr.write('ERROR: Can not create output directory\n')
+            sys.exit(1)    
+    
+    def queue_depth(self):
+        """number of result batches waiting to be written"""
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:  # qsize() is not available on mac os x
+            return 0
+    
+    def stats(self):
+        """what the writer handled, and what that cost, as a json-friendly dict"""
+        p50, p99 = self.queue_lag.percentiles([50, 99])
+        return dict(transactions=self.trans_count, timers=self.timer_count, errors=self.error_count,
+                    batches=self.batch_count, cpu_secs=self.cpu_secs,
+                    queue_lag=dict(avg=self.queue_lag.mean, p50=p50, p99=p99, 
+                                   max=self.queue_lag.max if self.queue_lag.count else None))
+    
+    def run(self):
+        thread_cpu_time = lib.clock.thread_cpu_time
+        if thread_cpu_time is not None:
+            cpu_start = thread_cpu_time()
+        try:
+            self.write()
+        finally:
+            if thread_cpu_time is not None:
+                self.cpu_secs = thread_cpu_time() - cpu_start
+    
+    def write(self):
+        import csv
+        if self.results_store:
+            import lib.resultsstore
+            store = lib.resultsstore.ResultsStore(self.output_dir + 'results_store')
+        with open(self.output_dir + 'results.csv', 'wb') as filestream:
+            f=csv.writer(filestream)
+            finished = False
+            while not finished:
+                # block for the next batch, then drain whatever else is already waiting
+                batches = [self.queue.get()]
+                try:
+                    while len(batches) < 100:
+                        batches.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    pass
+                rows = []
+                timer_values = {'Transactions': []}  # for the live stats
+                num_errors = 0
+                for batch in batches:
+                    if batch is None:  # sent by run_test once all user groups are done
+                        finished = True
+                        continue
+                    user_group_name, sent_time, timings, errors, timers_list, counters = batch
+                    self.late_count += counters.get('late', 0)
+                    self.missed_count += counters.get('missed', 0)
+                    timings = array.array('d', timings)
+                    for i, custom_timers in enumerate(timers_list):
+                        elapsed, epoch, scriptrun_time = timings[3 * i:3 * i + 3]
+                        error = errors.get(i, '')
+                        self.trans_count += 1
+                        self.timer_count += len(custom_timers)
+                        if error != '':
+                            self.error_count += 1
+                            num_errors += 1
+                        timer_values['Transactions'].append(scriptrun_time)
+                        for timer_name, val in custom_timers.iteritems():
+                            values = timer_values.setdefault(timer_name, [])
+                            if not isinstance(val, (list, tuple)):
+                                values.append(val)
+                            elif val and isinstance(val[0], (list, tuple)):
+                                values.extend(v for t, v in val)
+                            else:
+                                values.extend(val)
+                        rows.append((self.trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, custom_timers))
+                        if self.console_logging:
+                            print '%i, %.3f, %i, %s, %.3f, %s, %s' % (self.trans_count, elapsed, epoch, user_group_name, scriptrun_time, error, repr(custom_timers))
+                    # from each transaction finishing (its epoch) until now, so the time 
+                    # it waited in its process's ResultsBuffer counts as well as the queue
+                    now = time.time()
+                    lags = [now - trans_epoch for trans_epoch in timings[1::3]]
+                    self.queue_lag.add_array(lags)
+                    self.writer_lag = max(lags) if lags else now - sent_time
+                    self.batch_count += 1
+                if rows:
+                    self.live_stats.add(timer_values, num_errors)
+                f.writerows(row[:-1] + (json.dumps(row[-1]),) for row in rows)
+                filestream.flush()
+                if self.results_store:
+                    store.append(rows)
+                if self.db_sink is not None:
+                    self.db_sink.add(rows)
+                if self.streamer is not None:
+                    self.streamer.add(rows)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
+#  License: GNU LGPLv3
+#  
+#  This file is part of Multi-Mechanize
+#
+#
+#  a transaction for measuring the harness itself (see lib/tools/bench_harness.py).
+#  it does nothing but sleep for latency secs and record timers custom timers, 
+#  set with script_options, e.g.:  script_options: latency=0.01, timers=5
+
+
+import time
+
+
+
+class Transaction(object):
+    def __init__(self, latency=0.0, timers=0):
+        self.latency = latency
+        self.timer_names = ['Timer_%i' % i for i in range(timers)]
+        self.custom_timers = {}
+    
+    def run(self):
+        if self.latency:
+            time.sleep(self.latency)
+        for name in self.timer_names:
+            self.custom_timers[name] = self.latency
+        
+
+ 
+if __name__ == '__main__':
+    trans = Transaction(0.01, 2)
+    trans.run()
+    print trans.custom_timers
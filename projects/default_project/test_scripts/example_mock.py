@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python
 #
 #  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
 #  License: GNU LGPLv3
@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python
 #
 #  Copyright (c) 2010 Corey Goldberg (corey@goldb.org)
 #  License: GNU LGPLv3
@@ -22,8 +22,8 @@ class Transaction(object):
         latency = time.time() - start_timer
         
         self.custom_timers['Example_Homepage'] = latency
-        
-        assert (resp.code == 200), 'Bad HTTP Response'
+        
+        assert (resp.code == 200), 'Bad HTTP Response'
         assert ('Example Web Page' in content), 'Failed Content Verification'
 
 